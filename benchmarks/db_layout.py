@@ -0,0 +1,119 @@
+"""题库存储格式基准：旧版 lib_<id> 分表 vs 新版 answers 单表
+
+用法: python benchmarks/db_layout.py [--libs 2000] [--versions 5] [--lookups 20000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wkhelper.db import apply_schema  # noqa: E402
+
+
+class LegacyLayout:
+    """旧版实现：每个题库一张表，缺表时靠异常返回"""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+
+    def save(self, library_id: str, version: str, answer: list):
+        table = f"lib_{library_id}"
+        self.conn.execute(
+            f'CREATE TABLE IF NOT EXISTS "{table}" (version TEXT PRIMARY KEY, answer TEXT)'
+        )
+        self.conn.execute(
+            f'INSERT OR REPLACE INTO "{table}" (version, answer) VALUES (?, ?)',
+            (version, json.dumps(answer)),
+        )
+        self.conn.commit()
+
+    def get(self, library_id: str, version: str):
+        try:
+            row = self.conn.execute(
+                f'SELECT answer FROM "lib_{library_id}" WHERE version = ?', (version,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return json.loads(row[0]) if row else None
+
+
+class SingleTableLayout:
+    """新版实现：answers 单表 + WAL"""
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path)
+        apply_schema(self.conn)
+
+    def save(self, library_id: str, version: str, answer: list):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO answers (library_id, version, answer) VALUES (?, ?, ?)",
+            (library_id, version, json.dumps(answer)),
+        )
+        self.conn.commit()
+
+    def get(self, library_id: str, version: str):
+        row = self.conn.execute(
+            "SELECT answer FROM answers WHERE library_id = ? AND version = ?",
+            (library_id, version),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def run(layout_cls, path: str, records: list, probes: list) -> tuple[float, float]:
+    layout = layout_cls(path)
+    start = time.perf_counter()
+    for lib, ver, ans in records:
+        layout.save(lib, ver, ans)
+    insert_rate = len(records) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for lib, ver in probes:
+        layout.get(lib, ver)
+    lookup_rate = len(probes) / (time.perf_counter() - start)
+    layout.conn.close()
+    return insert_rate, lookup_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="题库存储格式基准")
+    parser.add_argument("--libs", type=int, default=2000)
+    parser.add_argument("--versions", type=int, default=5)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    records = [
+        (str(lib), uuid.UUID(int=rng.getrandbits(128)).hex, rng.sample("ABCD", 2))
+        for lib in range(args.libs)
+        for _ in range(args.versions)
+    ]
+    # 一半命中，一半未命中（其中一半落在不存在的题库上）
+    probes = []
+    for i in range(args.lookups):
+        lib, ver, _ = rng.choice(records)
+        if i % 2 == 0:
+            probes.append((lib, ver))
+        elif i % 4 == 1:
+            probes.append((lib, uuid.uuid4().hex))
+        else:
+            probes.append((str(args.libs + i), ver))
+
+    print(f"{len(records)} 条答案，{len(probes)} 次查询（50% 命中）")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, layout_cls in (("legacy", LegacyLayout), ("single", SingleTableLayout)):
+            insert_rate, lookup_rate = run(
+                layout_cls, os.path.join(tmp, f"{name}.db"), records, probes
+            )
+            print(f"{name:<8} insert {insert_rate:10.0f} rows/s  lookup {lookup_rate:10.0f} q/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""响应解码基准：json.loads(response.text) vs transport.loads(response.content)
+
+response.text 在响应头没有声明 charset 时会先做字符集探测（charset_normalizer），
+再把整段字节解码成 str；decode_json 直接解析字节，安装了 orjson 时使用 orjson。
+
+用法: python benchmarks/decode.py [--payload chapter.json ...] [--rounds 200]
+不指定 --payload 时按章节树 / 题目列表的结构生成样例数据。
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wkhelper import transport  # noqa: E402
+
+try:
+    import charset_normalizer
+except ImportError:
+    charset_normalizer = None
+
+
+def sample_chapter(rng: random.Random, chapters: int = 40, leaves: int = 25) -> bytes:
+    course_chapter = [
+        {
+            "id": c,
+            "name": f"第{c}章 课程内容概述与重点难点讲解",
+            "section_leaf_list": [
+                {
+                    "id": c * 1000 + s,
+                    "name": f"{c}.{s} 视频讲解：知识点与例题分析",
+                    "leaf_type": rng.choice((0, 3, 6)),
+                    "start_time": 1700000000000 + s,
+                    "score_deadline": 1800000000000 + s,
+                    "is_score": rng.random() < 0.5,
+                    "chapter_id": c,
+                }
+                for s in range(leaves)
+            ],
+        }
+        for c in range(chapters)
+    ]
+    payload = {"success": True, "data": {"course_chapter": course_chapter}}
+    return json.dumps(payload, ensure_ascii=False).encode()
+
+
+def sample_exercise(rng: random.Random, problems: int = 60) -> bytes:
+    payload = {
+        "success": True,
+        "data": {
+            "problems": [
+                {
+                    "problem_id": p,
+                    "max_retry": 3,
+                    "content": {
+                        "LibraryID": 100000 + p,
+                        "Version": f"{rng.getrandbits(64):016x}",
+                        "Body": "<p>下列关于该知识点的说法中，正确的是哪一项？" * 4 + "</p>",
+                        "Options": [
+                            {"key": k, "value": f"<p>选项 {k} 的内容描述</p>"}
+                            for k in "ABCD"
+                        ],
+                    },
+                    "user": {"my_count": 1, "is_right": False, "answer": ["A"]},
+                }
+                for p in range(problems)
+            ]
+        },
+    }
+    return json.dumps(payload, ensure_ascii=False).encode()
+
+
+def via_text(content: bytes):
+    """模拟 response.text：探测字符集 -> 解码为 str -> json.loads"""
+    encoding = "utf-8"
+    if charset_normalizer is not None:
+        encoding = charset_normalizer.from_bytes(content).best().encoding
+    return json.loads(content.decode(encoding))
+
+
+def bench(func, content: bytes, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(content)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应解码基准")
+    parser.add_argument("--payload", action="append", default=[], help="录制的响应体")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.payload:
+        payloads = []
+        for path in args.payload:
+            with open(path, "rb") as f:
+                payloads.append((os.path.basename(path), f.read()))
+    else:
+        rng = random.Random(0)
+        payloads = [("chapter", sample_chapter(rng)), ("exercise", sample_exercise(rng))]
+
+    print(
+        f"字符集探测: {'charset_normalizer' if charset_normalizer else '未安装，按 utf-8'}"
+        f"  JSON 后端: {'orjson' if transport.orjson else 'json'}"
+    )
+    for name, content in payloads:
+        text_ms = bench(via_text, content, args.rounds)
+        bytes_ms = bench(json.loads, content, args.rounds)
+        fast_ms = bench(transport.loads, content, args.rounds)
+        print(
+            f"{name:<10} {len(content) / 1024:8.1f} KiB  "
+            f"text {text_ms:7.3f} ms  bytes {bytes_ms:7.3f} ms  "
+            f"decode_json {fast_ms:7.3f} ms  ({text_ms / fast_ms:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
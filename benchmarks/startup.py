@@ -0,0 +1,110 @@
+"""启动耗时基准：导入耗时 + 首个菜单出现耗时
+
+用法: python benchmarks/startup.py [--runs 5] [--max-import-ms 300] [--max-menu-ms 500]
+超出阈值或加载了不应加载的登录依赖时以非零状态码退出，可用于回归检查。
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 复用登录状态时不应加载的重量级依赖
+HEAVY_MODULES = ("qrcode", "PIL", "pyzbar", "websocket")
+# pyproject.toml 中的第三方依赖，未安装时跳过对应平台，其余导入错误一律视为失败
+THIRD_PARTY = ("requests", "qrcode", "PIL", "pyzbar", "websocket")
+MISSING_RE = re.compile(r"ModuleNotFoundError: No module named '([\w.]+)'")
+
+IMPORT_SNIPPET = """
+import json, sys, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+from wkhelper.db import db
+print(json.dumps({{
+    "ms": elapsed * 1000,
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+    "db_opened": db.is_open,
+}}))
+"""
+
+
+class MissingDependency(Exception):
+    pass
+
+
+def measure_import(module: str) -> dict:
+    """在子进程中导入模块；缺少第三方依赖时抛出 MissingDependency，其余错误抛出 RuntimeError"""
+    code = IMPORT_SNIPPET.format(module=module, heavy=HEAVY_MODULES)
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        match = MISSING_RE.search(proc.stderr)
+        if match and match.group(1).split(".")[0] in THIRD_PARTY:
+            raise MissingDependency(match.group(1))
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def measure_first_menu() -> float:
+    """启动 main.py，直到平台选择菜单输出为止"""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-u", "main.py"],
+        cwd=ROOT,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    assert proc.stdout is not None
+    while True:
+        line = proc.stdout.readline()
+        if not line or "请选择学习平台".encode() in line:
+            break
+    elapsed = time.perf_counter() - start
+    proc.communicate(b"\n", timeout=10)
+    return elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=300)
+    parser.add_argument("--max-menu-ms", type=float, default=500)
+    args = parser.parse_args()
+
+    failed = False
+    for module in ("main", "wkhelper.ykt.main", "wkhelper.xtzx.main"):
+        try:
+            results = [measure_import(module) for _ in range(args.runs)]
+        except MissingDependency as e:
+            print(f"{module:<22} 跳过（依赖 {e} 未安装）")
+            continue
+        except RuntimeError as e:
+            print(f"{module:<22} 导入失败: {e}")
+            failed = True
+            continue
+        median = statistics.median(r["ms"] for r in results)
+        heavy = sorted({m for r in results for m in r["heavy"]})
+        db_opened = any(r["db_opened"] for r in results)
+        print(f"{module:<22} import {median:8.1f} ms  heavy={heavy}  db_opened={db_opened}")
+        if median > args.max_import_ms or heavy or db_opened:
+            failed = True
+
+    menu = statistics.median(measure_first_menu() for _ in range(args.runs))
+    print(f"{'time-to-first-menu':<22} menu   {menu:8.1f} ms")
+    if menu > args.max_menu_ms:
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
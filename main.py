@@ -1,7 +1,3 @@
-from wkhelper.xtzx.main import main as xtzx_main
-from wkhelper.ykt.main import main as ykt_main
-
-
 def main():
     print("\n==================================")
     print("      自动学习工具整合版")
@@ -12,9 +8,14 @@ def main():
 
     choice = input("\n输入平台编号: ").strip()
 
+    # 按需导入平台模块，避免加载未使用平台的登录依赖
     if choice == "1":
+        from wkhelper.ykt.main import main as ykt_main
+
         ykt_main()
     elif choice == "2":
+        from wkhelper.xtzx.main import main as xtzx_main
+
         xtzx_main()
     else:
         print("❌ 输入无效，程序退出")
@@ -0,0 +1,114 @@
+import sqlite3
+
+import pytest
+
+from wkhelper.codec import (
+    TAG_CHOICE,
+    TAG_CHOICE_STR,
+    TAG_JSON,
+    TAG_TEXT,
+    decode_answer,
+    encode_answer,
+    submit_answer,
+)
+from wkhelper.db import ENCODING_KEY, apply_schema, migrate_encoding
+
+ROUND_TRIP = [
+    ["A"],
+    ["A", "C"],
+    ["B", "A"],
+    ["A", "A"],
+    ["Z"],
+    [],
+    ["TRUE"],
+    ["第一空", "第二空", ""],
+    ["x" * 300],
+    "ABC",
+    "A",
+    "BA",
+    "AAB",
+    "TRUE",
+    "",
+    [{"1": "x"}],
+    [["A"]],
+    [1, 2],
+    ["A", 1],
+    {"blank": ["a"]},
+    True,
+    None,
+]
+
+
+@pytest.mark.parametrize("answer", ROUND_TRIP, ids=repr)
+def test_round_trip(answer):
+    assert decode_answer(encode_answer(answer)) == answer
+
+
+def test_tuple_decodes_as_list():
+    assert decode_answer(encode_answer(("A", "B"))) == ["A", "B"]
+
+
+@pytest.mark.parametrize(
+    "answer, tag",
+    [
+        (["A", "B", "D"], TAG_CHOICE),
+        (["B", "A"], TAG_TEXT),
+        (["A", "A"], TAG_TEXT),
+        (["a"], TAG_TEXT),
+        ("A", TAG_CHOICE_STR),
+        ("ABC", TAG_CHOICE_STR),
+        ("BA", TAG_JSON),
+        ("TRUE", TAG_JSON),
+        ("abc", TAG_JSON),
+        ([["A"]], TAG_JSON),
+    ],
+)
+def test_tag(answer, tag):
+    assert encode_answer(answer)[0] == tag
+
+
+def test_decode_legacy_json_text():
+    assert decode_answer('["A", "B"]') == ["A", "B"]
+    assert decode_answer('"ABC"') == "ABC"
+    assert decode_answer("not json") == "not json"
+
+
+def test_submit_answer():
+    assert submit_answer(["B", "A"]) == ["B", "A"]
+    assert submit_answer("ABC") == ["ABC"]
+    assert submit_answer("ABC", split_choices=True) == ["A", "B", "C"]
+    assert submit_answer("abc", split_choices=True) == ["abc"]
+
+
+def _answers_db() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    apply_schema(conn)
+    return conn
+
+
+def test_migrate_encoding_once():
+    conn = _answers_db()
+    conn.executemany(
+        "INSERT INTO answers VALUES (?, ?, ?)",
+        [
+            ("1", "v", '["B", "A"]'),
+            ("2", "v", '[{"1": "x"}]'),
+            ("3", "v", "ABC"),
+            # 旧版编码把 "ABC" 存为 JSON，迁移后改用选项掩码
+            ("4", "v", b'\x03"ABC"'),
+            ("5", "v", encode_answer(["A"])),
+        ],
+    )
+    assert migrate_encoding(conn, batch_size=2) == 4
+    rows = dict(conn.execute("SELECT library_id, answer FROM answers"))
+    assert decode_answer(rows["1"]) == ["B", "A"]
+    assert decode_answer(rows["2"]) == [{"1": "x"}]
+    assert decode_answer(rows["3"]) == "ABC"
+    assert rows["4"][0] == TAG_CHOICE_STR
+    assert decode_answer(rows["4"]) == "ABC"
+
+    # 已记录编码版本，之后新插入的 JSON 文本不会再被扫描
+    marker = conn.execute("SELECT value FROM meta WHERE key = ?", (ENCODING_KEY,))
+    assert marker.fetchone()
+    conn.execute("INSERT INTO answers VALUES ('6', 'v', '[\"A\"]')")
+    assert migrate_encoding(conn) == 0
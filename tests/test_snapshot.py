@@ -0,0 +1,107 @@
+import argparse
+import sqlite3
+from threading import local
+
+import pytest
+
+from wkhelper.bank import cmd_compile
+from wkhelper.codec import encode_answer
+from wkhelper.db import db
+from wkhelper.snapshot import Snapshot, compile_snapshot
+
+ANSWERS = {
+    ("1001", "v1"): ["A", "C"],
+    ("1001", "v2"): ["B", "A"],
+    ("1002", "v1"): ["第一空", "第二空"],
+    ("1003", "v1"): "TRUE",
+    ("1004", "v1"): [{"1": "x"}],
+}
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = tmp_path / "questions.snap"
+    records = ((lib, ver, encode_answer(ans)) for (lib, ver), ans in ANSWERS.items())
+    assert compile_snapshot(records, str(path), revision=7) == len(ANSWERS)
+    snap = Snapshot(str(path))
+    yield snap
+    snap.close()
+
+
+def test_round_trip(snapshot):
+    assert len(snapshot) == len(ANSWERS)
+    assert snapshot.revision == 7
+    for (lib, ver), answer in ANSWERS.items():
+        assert snapshot.get(lib, ver) == answer
+        assert snapshot.get_raw(lib, ver) == encode_answer(answer)
+
+
+def test_missing_key(snapshot):
+    assert snapshot.get("1001", "v3") is None
+    assert snapshot.get("9999", "v1") is None
+
+
+def test_empty(tmp_path):
+    path = tmp_path / "empty.snap"
+    assert compile_snapshot([], str(path)) == 0
+    snap = Snapshot(str(path))
+    assert len(snap) == 0
+    assert snap.get("1", "v") is None
+    snap.close()
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "bogus.snap"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+
+
+@pytest.fixture
+def bank(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "db_path", str(tmp_path / "questions.db"))
+    monkeypatch.setattr(db, "conn", None)
+    monkeypatch.setattr(db, "_local", local())
+    monkeypatch.setattr(db, "snapshot_path", str(tmp_path / "questions.snap"))
+    monkeypatch.setattr(db, "snapshot", None)
+    monkeypatch.setattr(db, "_snapshot_checked", True)
+    yield db
+    for conn in (db.conn, getattr(db._local, "conn", None)):
+        if conn is not None:
+            conn.close()
+    if db.snapshot is not None:
+        db.snapshot.close()
+
+
+def test_compile_unmigrated_bank(bank, tmp_path):
+    # 旧版分表 + JSON 文本，编译前需要先迁移
+    conn = sqlite3.connect(bank.db_path)
+    conn.execute('CREATE TABLE "lib_1001" (version TEXT PRIMARY KEY, answer TEXT)')
+    conn.execute("""INSERT INTO "lib_1001" VALUES ('v1', '["A", "C"]')""")
+    conn.commit()
+    conn.close()
+
+    path = str(tmp_path / "questions.snap")
+    cmd_compile(argparse.Namespace(output=path))
+    snap = Snapshot(path)
+    assert snap.get("1001", "v1") == ["A", "C"]
+    assert snap.revision == bank.get_revision()
+    snap.close()
+
+
+def test_open_snapshot_without_writer(bank, tmp_path):
+    bank.save_answer("1001", "v1", ["B"])
+    path = str(tmp_path / "questions.snap")
+    cmd_compile(argparse.Namespace(output=path))
+    bank.conn.close()
+    bank.conn = None
+    bank._local = local()
+
+    assert bank.open_snapshot(path)
+    assert not bank.is_open
+    assert bank.get_answer("1001", "v1") == ["B"]
+
+    # 写入后修订号变化，旧快照不再加载
+    bank.snapshot.close()
+    bank.save_answer("1001", "v1", ["C"])
+    assert not bank.open_snapshot(path)
@@ -1,2 +1,8 @@
-from . import xtzx as xtzx
-from . import ykt as ykt
+import importlib
+
+
+def __getattr__(name: str):
+    # 延迟导入子平台，避免 import wkhelper 时加载全部依赖
+    if name in ("xtzx", "ykt"):
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,232 @@
+"""asyncio 执行引擎
+
+HTTP 请求仍由 requests 发出，放在一个有界的 IO 线程池里执行；
+提交间隔、心跳间隔、限流等待等全部由协程 asyncio.sleep 承担，
+因此成百上千个并发等待只占用协程，不再占用操作系统线程。
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Coroutine, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+from typing import Any, TypeVar
+
+from .utils import log
+
+T = TypeVar("T")
+
+# 同时执行阻塞 HTTP 请求的线程数；transport 按此配置连接池大小，
+# 保证每个线程都能拿到复用的连接，不会出现 "connection pool is full"
+IO_WORKERS = 10
+# 全局调度器同时运行的任务数（所有课程共享）
+WORK_CONCURRENCY = 5
+# 同时进行中的答案提交数（所有作业共享）
+SUBMIT_CONCURRENCY = 5
+# BatchWriter 每批写入的条数与队列容量
+WRITE_BATCH_SIZE = 500
+WRITE_QUEUE_SIZE = 2000
+
+_executor: ThreadPoolExecutor | None = None
+_writer_executor: ThreadPoolExecutor | None = None
+_lock = Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=IO_WORKERS, thread_name_prefix="wkhelper-io"
+            )
+        return _executor
+
+
+def _get_writer_executor() -> ThreadPoolExecutor:
+    global _writer_executor
+    with _lock:
+        if _writer_executor is None:
+            _writer_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="wkhelper-writer"
+            )
+        return _writer_executor
+
+
+async def run_io(func: Callable[..., T], *args, **kwargs) -> T:
+    """在 IO 线程池中执行阻塞调用"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+
+def log_error(e: BaseException):
+    log(f"❌ 任务出错: {type(e).__name__}: {e}")
+
+
+class Scheduler:
+    """进程级任务调度器
+
+    所有课程的任务共享同一个并发预算，任一任务结束立即由下一个任务补位，
+    总耗时趋近于 总工作量 / 并发数，而不是各课程最慢任务之和。
+    任务内部不要再向同一个调度器提交子任务，否则会占满预算互相等待。
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # 每次 run() 都是新的事件循环，信号量需要随循环重建
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._semaphore
+
+    async def submit(self, aw: Awaitable[T]) -> T:
+        async with self._get_semaphore():
+            return await aw
+
+    async def map(self, aws: Iterable[Awaitable[T]], default: Any = None) -> list[T]:
+        """提交一批任务并等待全部完成，结果按传入顺序返回
+
+        单个任务出错时记录日志并以 default 作为它的结果，其余任务照常完成。
+        """
+        return await asyncio.gather(*(self._guarded(aw, default) for aw in aws))
+
+    async def _guarded(self, aw: Awaitable[T], default: Any) -> T:
+        try:
+            return await self.submit(aw)
+        except Exception as e:
+            log_error(e)
+            return default
+
+
+scheduler = Scheduler(WORK_CONCURRENCY)
+# 题目级提交单独限流：作业任务在 scheduler 中运行，其中的提交再进入这里，
+# 两级预算互不占用，不会因嵌套而死锁
+submit_scheduler = Scheduler(SUBMIT_CONCURRENCY)
+
+
+_DONE = object()
+
+
+class BatchWriter:
+    """流式写入：生产者按完成顺序放入记录，专用写线程攒批写入
+
+    队列有界，生产者快于写入时自动等待，内存占用不随总量增长；
+    写入在独立线程中进行，与网络请求重叠。用法:
+        async with BatchWriter(db.save_answers_bulk) as writer:
+            await writer.put(record)
+    count 为写入的记录数；sink 返回整数（如实际变更的条数）时累加到 written。
+    某一批写入失败时记录日志并把该批记录放入 failed，之后的批次继续写入。
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[list], Any],
+        batch_size: int = WRITE_BATCH_SIZE,
+        maxsize: int = WRITE_QUEUE_SIZE,
+    ):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.maxsize = maxsize
+        self.count = 0
+        self.written = 0
+        self.failed: list = []
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "BatchWriter":
+        self._queue = asyncio.Queue(self.maxsize)
+        self._task = asyncio.create_task(self._drain())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if not self._task.done():
+            await self._queue.put(_DONE)
+        await self._task
+
+    async def put(self, item):
+        if self._task.done():
+            # 写线程已出错退出，直接抛出其异常，避免生产者在满队列上永久等待
+            self._task.result()
+        await self._queue.put(item)
+
+    async def _write(self, batch: list):
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                _get_writer_executor(), self.sink, batch
+            )
+        except Exception as e:
+            log(f"❌ 写入 {len(batch)} 条记录失败: {e}")
+            self.failed.extend(batch)
+            return
+        self.count += len(batch)
+        if isinstance(result, int):
+            self.written += result
+
+    async def _drain(self):
+        batch = []
+        while True:
+            item = await self._queue.get()
+            if item is _DONE:
+                break
+            batch.append(item)
+            # 攒满一批，或者暂时没有新记录时就写入，不让已完成的结果干等
+            if len(batch) >= self.batch_size or self._queue.empty():
+                await self._write(batch)
+                batch = []
+        if batch:
+            await self._write(batch)
+
+
+Stage = tuple[Callable[[Any], Awaitable[Iterable | None]], int]
+
+
+async def run_pipeline(items: Iterable, stages: list[Stage], maxsize: int = 100):
+    """分阶段流水线
+
+    每个阶段为 (handler, 并发数)：handler 处理一个输入，返回交给下一阶段的输入列表
+    （None 表示没有输出）。各阶段有独立的有界队列和工作协程，上游一有结果
+    下游立即开始处理，阶段之间互相重叠。
+    """
+    queues = [asyncio.Queue(maxsize) for _ in stages]
+
+    async def feed():
+        for item in items:
+            await queues[0].put(item)
+        for _ in range(stages[0][1]):
+            await queues[0].put(_DONE)
+
+    async def work(index: int):
+        handler = stages[index][0]
+        downstream = queues[index + 1] if index + 1 < len(stages) else None
+        while True:
+            item = await queues[index].get()
+            if item is _DONE:
+                return
+            try:
+                outputs = await handler(item)
+            except Exception as e:
+                # 单个输入出错只丢弃该输入，不影响流水线中的其他输入
+                log_error(e)
+                outputs = None
+            if downstream is not None and outputs:
+                for output in outputs:
+                    await downstream.put(output)
+
+    async def run_stage(index: int):
+        await asyncio.gather(*(work(index) for _ in range(stages[index][1])))
+        # 本阶段全部结束后通知下一阶段的每个工作协程退出
+        if index + 1 < len(stages):
+            for _ in range(stages[index + 1][1]):
+                await queues[index + 1].put(_DONE)
+
+    await asyncio.gather(feed(), *(run_stage(i) for i in range(len(stages))))
+
+
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    """同步入口：在新的事件循环中运行协程直到完成"""
+    return asyncio.run(coro)
@@ -0,0 +1,153 @@
+"""题库维护命令
+
+用法:
+    python -m wkhelper.bank migrate [--db PATH] [--vacuum]
+    python -m wkhelper.bank export FILE        # FILE 以 .gz 结尾时自动压缩
+    python -m wkhelper.bank import FILE [--batch-size N] [--restart]
+    python -m wkhelper.bank compile [--output PATH]
+"""
+
+import argparse
+import gzip
+import itertools
+import json
+import os
+import sqlite3
+
+from .codec import decode_answer, encode_answer
+from .db import (
+    BULK_FLUSH_SIZE,
+    apply_schema,
+    db,
+    migrate_encoding,
+    migrate_legacy,
+)
+from .snapshot import compile_snapshot
+from .utils import log
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def cmd_migrate(args: argparse.Namespace):
+    """将旧版 lib_<id> 分表格式的题库迁移为单表格式"""
+    conn = sqlite3.connect(args.db)
+    apply_schema(conn)
+
+    def on_table(i: int, total: int):
+        if i % 100 == 0 or i == total:
+            log(f"  迁移进度 {i}/{total} 张表")
+
+    count = migrate_legacy(conn, on_table)
+    encoded = migrate_encoding(conn)
+    if encoded:
+        log(f"  已将 {encoded} 条答案转换为紧凑编码")
+    if args.vacuum:
+        log("🧹 正在压缩数据库文件...")
+        conn.execute("VACUUM")
+    conn.close()
+    log(f"✅ 迁移完成，共 {count} 条答案")
+
+
+def cmd_export(args: argparse.Namespace):
+    """逐条导出题库为 JSONL，内存占用恒定"""
+    count = 0
+    with _open(args.file, "wt") as f:
+        for library_id, version, answer in db.iter_answers():
+            record = {"library_id": library_id, "version": version, "answer": answer}
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    log(f"✅ 已导出 {count} 条答案到 {args.file}")
+
+
+def _import_progress_key(path: str) -> str:
+    # 文件路径、大小和修改时间都不变时才视为同一次导入，可以续传
+    st = os.stat(path)
+    return f"import:{os.path.abspath(path)}:{st.st_size}:{int(st.st_mtime)}"
+
+
+def cmd_import(args: argparse.Namespace):
+    """分批导入 JSONL 题库，支持断点续传，跳过未变化的答案"""
+    progress_key = _import_progress_key(args.file)
+    start = 0 if args.restart else int(db.get_meta(progress_key) or 0)
+    if start:
+        log(f"⏩ 检测到未完成的导入，从第 {start + 1} 条继续")
+
+    read = 0
+
+    def records():
+        nonlocal read
+        with _open(args.file, "rt") as f:
+            for line in itertools.islice(f, start, None):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                read += 1
+                if read % 100000 == 0:
+                    log(f"  已读取 {start + read} 条")
+                yield record["library_id"], record["version"], record["answer"]
+
+    changed = db.save_answers_bulk(
+        records(), flush_size=args.batch_size, progress=(progress_key, start)
+    )
+    db.delete_meta(progress_key)
+    log(f"✅ 导入完成：读取 {read} 条，新增或更新 {changed} 条")
+
+
+def cmd_compile(args: argparse.Namespace):
+    """把题库编译为只读快照，之后的答案查询直接走快照"""
+    # 先完成迁移再读修订号，快照与迁移后的题库对应
+    db.migrate()
+    revision = db.get_revision()
+    # 编码迁移失败时残留的 JSON 文本在这里补做编码
+    records = (
+        (
+            library_id,
+            version,
+            encode_answer(decode_answer(answer)) if isinstance(answer, str) else answer,
+        )
+        for library_id, version, answer in db.iter_answers(decode=False)
+    )
+    count = compile_snapshot(records, args.output, revision)
+    log(f"✅ 已生成快照 {args.output}，共 {count} 条答案")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m wkhelper.bank", description="题库维护"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("migrate", help="迁移旧版题库格式")
+    p.add_argument("--db", default=db.db_path, help="题库文件路径")
+    p.add_argument("--vacuum", action="store_true", help="迁移后压缩数据库文件")
+    p.set_defaults(func=cmd_migrate)
+
+    p = sub.add_parser("export", help="导出题库为 JSONL（.gz 结尾时压缩）")
+    p.add_argument("file", help="输出文件路径")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="从 JSONL（可为 .gz）导入题库")
+    p.add_argument("file", help="输入文件路径")
+    p.add_argument(
+        "--batch-size", type=int, default=BULK_FLUSH_SIZE, help="每个事务写入的条数"
+    )
+    p.add_argument(
+        "--restart", action="store_true", help="忽略上次的导入进度，从头导入"
+    )
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("compile", help="编译只读题库快照")
+    p.add_argument("--output", default=db.snapshot_path, help="快照文件路径")
+    p.set_defaults(func=cmd_compile)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
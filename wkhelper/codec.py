@@ -0,0 +1,123 @@
+"""答案的规范化与紧凑编码
+
+字符串列表形式的答案在入库时编码为:
+    0x01 + uint32 位掩码         升序且不重复的选项列表，第 i 位表示选项 chr(ord("A") + i)
+    0x02 + (varint 长度 + UTF-8)*  其他字符串列表（保留顺序与重复项）
+    0x03 + JSON                   其余任何答案（原样保留）
+    0x04 + uint32 位掩码         由升序且不重复的选项字母组成的单个字符串，如 "ABC"
+编码是无损的，decode_answer(encode_answer(x)) 与 x 相等（元组还原为列表）。
+单个字符串的答案如何提交因平台而异，由 submit_answer 在提交时处理。
+"""
+
+import json
+import struct
+from typing import Any
+
+TAG_CHOICE = 1
+TAG_TEXT = 2
+TAG_JSON = 3
+TAG_CHOICE_STR = 4
+
+_MASK = struct.Struct("<I")
+
+
+def normalize_answer(answer: Any) -> list[str] | Any:
+    """字符串元组统一为列表，其他答案原样返回"""
+    if isinstance(answer, tuple) and all(isinstance(x, str) for x in answer):
+        return list(answer)
+    return answer
+
+
+def submit_answer(answer: Any, split_choices: bool = False) -> list | Any:
+    """转换为提交用的列表
+
+    单个字符串包装成列表；split_choices 为 True 时（雨课堂）"ABC" 这种
+    多选题答案拆成 ["A", "B", "C"]。
+    """
+    if isinstance(answer, str):
+        if split_choices and len(answer) > 1 and answer.isupper() and answer.isalpha():
+            return list(answer)
+        return [answer]
+    return answer
+
+
+def _is_text_list(answer: Any) -> bool:
+    return isinstance(answer, list) and all(isinstance(x, str) for x in answer)
+
+
+def _is_choice(answer: list[str]) -> bool:
+    # 位掩码会丢失顺序和重复项，只用于本来就升序且不重复的选项列表
+    return (
+        bool(answer)
+        and all(len(x) == 1 and "A" <= x <= "Z" for x in answer)
+        and all(a < b for a, b in zip(answer, answer[1:]))
+    )
+
+
+def _choice_mask(options) -> bytes:
+    mask = 0
+    for option in options:
+        mask |= 1 << (ord(option) - 65)
+    return _MASK.pack(mask)
+
+
+def _mask_options(data: bytes) -> list[str]:
+    mask = _MASK.unpack_from(data, 1)[0]
+    return [chr(65 + i) for i in range(26) if mask >> i & 1]
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode_answer(answer: Any) -> bytes:
+    answer = normalize_answer(answer)
+    if isinstance(answer, str) and _is_choice(list(answer)):
+        return bytes([TAG_CHOICE_STR]) + _choice_mask(answer)
+    if not _is_text_list(answer):
+        return bytes([TAG_JSON]) + json.dumps(answer, ensure_ascii=False).encode()
+    if _is_choice(answer):
+        return bytes([TAG_CHOICE]) + _choice_mask(answer)
+
+    out = bytearray([TAG_TEXT])
+    for item in answer:
+        data = item.encode()
+        _write_varint(out, len(data))
+        out += data
+    return bytes(out)
+
+
+def decode_answer(data: bytes | str) -> list[str] | Any:
+    # 兼容尚未迁移的 JSON 文本
+    if isinstance(data, str):
+        try:
+            return normalize_answer(json.loads(data))
+        except ValueError:
+            return data
+
+    tag = data[0]
+    if tag == TAG_CHOICE:
+        return _mask_options(data)
+    if tag == TAG_CHOICE_STR:
+        return "".join(_mask_options(data))
+    if tag == TAG_TEXT:
+        items = []
+        pos = 1
+        end = len(data)
+        while pos < end:
+            length = 0
+            shift = 0
+            while True:
+                byte = data[pos]
+                pos += 1
+                length |= (byte & 0x7F) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+            items.append(data[pos : pos + length].decode())
+            pos += length
+        return items
+    return json.loads(data[1:])
@@ -0,0 +1,161 @@
+import json
+import os
+import time
+from collections.abc import Callable
+from threading import Lock
+from typing import Required, TypedDict
+
+LEAF_VIDEO = 0
+LEAF_TEXT = 3
+LEAF_HOMEWORK = 6
+
+# 内存缓存有效期（秒）
+INDEX_TTL = 600
+# 设置 WKHELPER_DISK_CACHE=1 时同时缓存到磁盘，跨进程复用
+DISK_CACHE = os.environ.get("WKHELPER_DISK_CACHE") == "1"
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+
+class Leaf(TypedDict):
+    id: Required[int]
+    name: Required[str]
+    leaf_type: Required[int]
+    start_time: Required[int | None]
+    score_deadline: Required[int | None]
+    is_score: Required[bool | None]
+    chapter_id: Required[int | None]
+
+
+def iter_leaves(chapter_data: list[dict]):
+    for chapter in chapter_data:
+        if "section_leaf_list" in chapter:
+            for section in chapter["section_leaf_list"]:
+                yield from section.get("leaf_list", [section])
+
+
+class CourseIndex:
+    """单门课程的章节索引，按 leaf_type 分组保存所有叶子节点"""
+
+    def __init__(
+        self,
+        leaves_by_type: dict[int, list[Leaf]],
+        classroom_info: dict | None,
+        built_at: float,
+    ):
+        self.leaves_by_type = leaves_by_type
+        self.classroom_info = classroom_info
+        self.built_at = built_at
+
+    @classmethod
+    def from_chapters(
+        cls, chapter_data: list[dict], classroom_info: dict | None = None
+    ) -> "CourseIndex":
+        leaves_by_type: dict[int, list[Leaf]] = {}
+        for leaf in iter_leaves(chapter_data):
+            leaf_type = leaf.get("leaf_type")
+            if leaf_type is None:
+                continue
+            leaves_by_type.setdefault(leaf_type, []).append({
+                "id": leaf["id"],
+                "name": leaf["name"],
+                "leaf_type": leaf_type,
+                "start_time": leaf.get("start_time"),
+                "score_deadline": leaf.get("score_deadline"),
+                "is_score": leaf.get("is_score"),
+                "chapter_id": leaf.get("chapter_id"),
+            })
+        return cls(leaves_by_type, classroom_info, time.time())
+
+    def leaves(self, leaf_type: int) -> list[Leaf]:
+        return self.leaves_by_type.get(leaf_type, [])
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.time() - self.built_at < ttl
+
+    def to_dict(self) -> dict:
+        return {
+            "leaves": {str(k): v for k, v in self.leaves_by_type.items()},
+            "classroom_info": self.classroom_info,
+            "built_at": self.built_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CourseIndex":
+        return cls(
+            {int(k): v for k, v in data["leaves"].items()},
+            data.get("classroom_info"),
+            data["built_at"],
+        )
+
+
+_indexes: dict[tuple[str, str], CourseIndex] = {}
+_build_locks: dict[tuple[str, str], Lock] = {}
+_lock = Lock()
+
+
+def _disk_path(key: tuple[str, str]) -> str:
+    return os.path.join(CACHE_DIR, f"course_{key[0]}_{key[1]}.json")
+
+
+def _load_from_disk(key: tuple[str, str], ttl: float) -> CourseIndex | None:
+    try:
+        with open(_disk_path(key), encoding="utf-8") as f:
+            index = CourseIndex.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError):
+        return None
+    return index if index.is_fresh(ttl) else None
+
+
+def _save_to_disk(key: tuple[str, str], index: CourseIndex):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{_disk_path(key)}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index.to_dict(), f, ensure_ascii=False)
+    os.replace(tmp_path, _disk_path(key))
+
+
+def load_course_index(
+    platform: str,
+    classroom_id: int | str,
+    loader: Callable[[], tuple[list[dict], dict | None]],
+    ttl: float = INDEX_TTL,
+    disk_cache: bool | None = None,
+) -> CourseIndex:
+    """获取课程索引，缓存失效时调用 loader 拉取一次章节树"""
+    key = (platform, str(classroom_id))
+    if disk_cache is None:
+        disk_cache = DISK_CACHE
+
+    with _lock:
+        index = _indexes.get(key)
+        if index and index.is_fresh(ttl):
+            return index
+        build_lock = _build_locks.setdefault(key, Lock())
+
+    # 同一课程只允许一个线程拉取章节树，其余线程等待结果
+    with build_lock:
+        with _lock:
+            index = _indexes.get(key)
+        if index and index.is_fresh(ttl):
+            return index
+
+        index = _load_from_disk(key, ttl) if disk_cache else None
+        if index is None:
+            chapter_data, classroom_info = loader()
+            index = CourseIndex.from_chapters(chapter_data, classroom_info)
+            if disk_cache:
+                _save_to_disk(key, index)
+
+        with _lock:
+            _indexes[key] = index
+        return index
+
+
+def invalidate_course_index(platform: str, classroom_id: int | str):
+    key = (platform, str(classroom_id))
+    with _lock:
+        _indexes.pop(key, None)
+    try:
+        os.remove(_disk_path(key))
+    except OSError:
+        pass
@@ -1,10 +1,254 @@
-import json
 import os
 import sqlite3
-from threading import Lock
+from collections import OrderedDict
+from collections.abc import Iterable
+from pathlib import Path
+from threading import Lock, local
+
+from .codec import decode_answer, encode_answer
+from .snapshot import Snapshot
+
+# 批量写入时每批的条数，每批一次提交
+BULK_FLUSH_SIZE = 5000
+# 内存答案缓存最多保存的条目数（含未命中记录）
+ANSWER_CACHE_SIZE = 50000
+
+_MISSING = object()
+
+# 每次写入答案都会递增，用于判断快照是否过期
+REVISION_KEY = "revision"
+BUMP_REVISION = f"""
+    INSERT INTO meta (key, value) VALUES ('{REVISION_KEY}', '1')
+    ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+"""
+# 答案编码迁移完成后记入 meta，之后打开题库不再扫描全表；
+# 编码格式变化时递增版本号，已迁移的题库会按新格式再转换一次
+ENCODING_KEY = "encoding"
+ENCODING_VERSION = "2"
+
+
+# 单表存储所有题库答案，(library_id, version) 作为聚簇主键
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS answers (
+        library_id TEXT NOT NULL,
+        version TEXT NOT NULL,
+        answer BLOB NOT NULL,
+        PRIMARY KEY (library_id, version)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS leaf_types (
+        platform TEXT NOT NULL,
+        classroom_id TEXT NOT NULL,
+        leaf_id TEXT NOT NULL,
+        leaf_type_id INTEGER NOT NULL,
+        PRIMARY KEY (platform, classroom_id, leaf_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS harvest (
+        platform TEXT NOT NULL,
+        classroom_id TEXT NOT NULL,
+        leaf_id TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        content_hash TEXT NOT NULL,
+        settled INTEGER NOT NULL,
+        harvested_at INTEGER NOT NULL,
+        PRIMARY KEY (platform, classroom_id, leaf_id)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    ) WITHOUT ROWID
+    """,
+)
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+)
+
+
+def apply_schema(conn: sqlite3.Connection):
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    for statement in SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+
+
+def migrate_legacy(conn: sqlite3.Connection, on_table=None) -> int:
+    """把旧版 lib_<id> 分表逐表迁移到 answers 单表，返回迁移的答案条数
+
+    数据在 SQLite 内部以 INSERT ... SELECT 搬运，不经过 Python，内存占用恒定；
+    整个迁移在一个事务内完成，中途失败不会留下半迁移状态。
+    """
+    tables = [
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'lib_*'"
+        )
+    ]
+    if not tables:
+        return 0
+
+    total = 0
+    with conn:
+        for i, table in enumerate(tables, 1):
+            cursor = conn.execute(
+                f"""
+                INSERT OR REPLACE INTO answers (library_id, version, answer)
+                SELECT ?, version, answer FROM "{table}"
+            """,
+                (table[len("lib_") :],),
+            )
+            total += cursor.rowcount
+            conn.execute(f'DROP TABLE "{table}"')
+            # 迁移进来的是 JSON 文本，需要重新做编码迁移
+            conn.execute("DELETE FROM meta WHERE key = ?", (ENCODING_KEY,))
+            if on_table:
+                on_table(i, len(tables))
+    return total
+
+
+def migrate_encoding(
+    conn: sqlite3.Connection, batch_size: int = BULK_FLUSH_SIZE
+) -> int:
+    """把 JSON 文本或旧版编码的答案重新编码为当前格式，返回转换的条数
+
+    按主键分页读取，每页一次 executemany，整体在一个事务内完成；完成后在 meta
+    中记下编码版本，已迁移的题库直接跳过。无法转换的行保持原样（查询时仍可解析）。
+    """
+    row = conn.execute(
+        "SELECT value FROM meta WHERE key = ?", (ENCODING_KEY,)
+    ).fetchone()
+    if row and row[0] == ENCODING_VERSION:
+        return 0
+
+    total = 0
+    last = ("", "")
+    with conn:
+        while True:
+            rows = conn.execute(
+                """
+                SELECT library_id, version, answer FROM answers
+                WHERE (library_id, version) > (?, ?)
+                ORDER BY library_id, version LIMIT ?
+            """,
+                (*last, batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            last = rows[-1][:2]
+            updates = []
+            for library_id, version, answer in rows:
+                try:
+                    encoded = encode_answer(decode_answer(answer))
+                except Exception as e:
+                    print(f"跳过无法转换的答案 ({library_id}, {version}): {e}")
+                    continue
+                if encoded != answer:
+                    updates.append((encoded, library_id, version))
+            conn.executemany(
+                "UPDATE answers SET answer = ? WHERE library_id = ? AND version = ?",
+                updates,
+            )
+            total += len(updates)
+        if total:
+            conn.execute(BUMP_REVISION)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (ENCODING_KEY, ENCODING_VERSION),
+        )
+    return total
+
+
+class AnswerCache:
+    """线程安全的 LRU 答案缓存，同时记录已确认不存在的题目（缓存值为 None）
+
+    每次失效都递增代数并记在对应键上。查询前先取 stamp()，查询结果回填时
+    若该键在此之后被失效过就不写入，避免读到的旧值在写入失效之后又被缓存。
+    """
+
+    def __init__(self, maxsize: int = ANSWER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[tuple[str, str], list | None] = OrderedDict()
+        self._lock = Lock()
+        self._generation = 0
+        # 最近被失效的键 -> 失效时的代数；超出容量后丢弃最早的记录，
+        # 丢弃的最大代数记为 _floor，早于它开始的查询一律不回填
+        self._stamps: OrderedDict[tuple[str, str], int] = OrderedDict()
+        self._floor = 0
+
+    def stamp(self) -> int:
+        """查询题库之前调用，回填时传给 put"""
+        with self._lock:
+            return self._generation
+
+    def get(self, key: tuple[str, str]):
+        """返回缓存值（可能为 None 表示题库中没有），未缓存时返回 _MISSING"""
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: tuple[str, str], value: list | None, since: int | None = None):
+        with self._lock:
+            if since is not None and (
+                self._floor > since or self._stamps.get(key, 0) > since
+            ):
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, keys: Iterable[tuple[str, str]]):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+                self._stamps[key] = self._generation
+                self._stamps.move_to_end(key)
+            while len(self._stamps) > self.maxsize:
+                _, generation = self._stamps.popitem(last=False)
+                self._floor = generation
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._stamps.clear()
+            self._generation += 1
+            self._floor = self._generation
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+# 连接等待写锁的超时时间（毫秒），多个进程共用同一题库文件时生效
+BUSY_TIMEOUT_MS = 10000
 
 
 class DB:
+    """题库数据库
+
+    每个线程持有自己的只读连接，查询之间互不阻塞；所有写入共用一个写连接，
+    进程内由 self.lock 串行化，跨进程依靠 WAL + busy_timeout 协调。
+    """
+
     _instance = None
     _lock = Lock()
 
@@ -17,62 +261,408 @@ class DB:
 
     def _init_db(self):
         base_dir = os.path.dirname(os.path.abspath(__file__))
-        db_path = os.path.join(base_dir, "questions.db")
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.cursor = self.conn.cursor()
-        self.conn.commit()
+        self.db_path = os.path.join(base_dir, "questions.db")
+        self.snapshot_path = os.path.join(base_dir, "questions.snap")
+        self.conn = None
         self.lock = Lock()
+        self._local = local()
+        self.cache = AnswerCache()
+        self.snapshot: Snapshot | None = None
+        self._snapshot_checked = False
+        self._snapshot_lock = Lock()
 
-    def _get_table_name(self, library_id: str) -> str:
-        return f"lib_{str(library_id).replace('-', '_')}"
+    @property
+    def is_open(self) -> bool:
+        return self.conn is not None
 
-    def save_answer(self, library_id: str, version: str, answer: list | str):
-        table_name = self._get_table_name(library_id)
+    def _writer(self) -> sqlite3.Connection:
+        """首次使用时再打开写连接并初始化表结构（需持有 self.lock）"""
+        if self.conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                check_same_thread=False,
+                timeout=BUSY_TIMEOUT_MS / 1000,
+            )
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            apply_schema(conn)
+            migrated = migrate_legacy(conn)
+            if migrated:
+                print(f"已将 {migrated} 条答案迁移到新版题库格式")
+            try:
+                migrate_encoding(conn)
+            except Exception as e:
+                # 迁移失败不影响使用：未转换的 JSON 文本在查询时仍可解析
+                print(f"答案编码迁移失败，下次打开题库时重试: {e}")
+            self.conn = conn
+        return self.conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """当前线程的只读连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.conn is None:
+                with self.lock:
+                    self._writer()
+            conn = sqlite3.connect(
+                f"{Path(self.db_path).resolve().as_uri()}?mode=ro",
+                uri=True,
+                timeout=BUSY_TIMEOUT_MS / 1000,
+            )
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA mmap_size = 268435456")
+            self._local.conn = conn
+        return conn
 
+    def save_answer(self, library_id: str, version: str, answer: list | str):
+        """保存答案，入库前统一规范化为紧凑编码"""
         with self.lock:
             try:
-                self.cursor.execute(f"""
-                    CREATE TABLE IF NOT EXISTS "{table_name}" (
-                        version TEXT PRIMARY KEY,
-                        answer TEXT
+                conn = self._writer()
+                encoded = encode_answer(answer)
+                with conn:
+                    conn.execute(
+                        """
+                        INSERT OR REPLACE INTO answers (library_id, version, answer)
+                        VALUES (?, ?, ?)
+                    """,
+                        (str(library_id), str(version), encoded),
                     )
-                """)
+                    conn.execute(BUMP_REVISION)
+                self.snapshot = None
+            except Exception as e:
+                print(f"Error saving answer: {e}")
+        self.cache.invalidate([(str(library_id), str(version))])
 
-                answer_json = json.dumps(answer, ensure_ascii=False)
-                self.cursor.execute(
-                    f"""
-                    INSERT OR REPLACE INTO "{table_name}" (version, answer)
-                    VALUES (?, ?)
+    def save_answers_bulk(
+        self,
+        records: Iterable[tuple[str, str, list | str]],
+        flush_size: int = BULK_FLUSH_SIZE,
+        progress: tuple[str, int] | None = None,
+    ) -> int:
+        """批量保存答案，每 flush_size 条在一个事务中写入，返回实际变更的条数
+
+        与库中已有值相同的答案不会被重写。若指定 progress=(key, 起始条数)，
+        每批提交时会在同一事务内把已处理的条数记入 meta 表，用于断点续传。
+        写入失败时当前批次回滚并抛出异常，之前提交的批次保留。
+        """
+        progress_key, consumed = progress or (None, 0)
+        changed = 0
+        batch = []
+        for library_id, version, answer in records:
+            batch.append((str(library_id), str(version), encode_answer(answer)))
+            consumed += 1
+            if len(batch) >= flush_size:
+                changed += self._flush_answers(batch, progress_key, consumed)
+                batch = []
+        if batch:
+            changed += self._flush_answers(batch, progress_key, consumed)
+        return changed
+
+    def _flush_answers(
+        self,
+        rows: list[tuple[str, str, bytes]],
+        progress_key: str | None = None,
+        consumed: int = 0,
+    ) -> int:
+        with self.lock:
+            conn = self._writer()
+            before = conn.total_changes
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO answers (library_id, version, answer)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (library_id, version) DO UPDATE
+                    SET answer = excluded.answer
+                    WHERE answer != excluded.answer
                 """,
-                    (str(version), answer_json),
+                    rows,
                 )
-                self.conn.commit()
-            except Exception as e:
-                print(f"Error saving answer: {e}")
+                changed = conn.total_changes - before
+                if changed:
+                    conn.execute(BUMP_REVISION)
+                    self.snapshot = None
+                if progress_key:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                        (progress_key, str(consumed)),
+                    )
+        self.cache.invalidate((library_id, version) for library_id, version, _ in rows)
+        return changed
+
+    def iter_answers(self, batch_size: int = 1000, decode: bool = True):
+        """按主键顺序流式遍历全部答案，内存占用与题库大小无关"""
+        cursor = self._reader().execute(
+            "SELECT library_id, version, answer FROM answers ORDER BY library_id, version"
+        )
+        while rows := cursor.fetchmany(batch_size):
+            for library_id, version, answer in rows:
+                yield library_id, version, decode_answer(answer) if decode else answer
+
+    def get_revision(self) -> int:
+        return int(self.get_meta(REVISION_KEY) or 0)
+
+    def _peek_revision(self) -> int | None:
+        """不打开写连接、不触发迁移，直接只读查询题库修订号；读取失败时返回 None"""
+        if not os.path.exists(self.db_path):
+            return 0
+        try:
+            conn = sqlite3.connect(
+                f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True
+            )
+            try:
+                row = conn.execute(
+                    "SELECT value FROM meta WHERE key = ?", (REVISION_KEY,)
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None
+        return int(row[0]) if row else 0
+
+    def migrate(self):
+        """打开写连接，完成旧版分表与答案编码的迁移"""
+        with self.lock:
+            self._writer()
+
+    def open_snapshot(self, path: str | None = None) -> bool:
+        """加载只读快照，之后的查询直接由快照应答；快照过期时不加载"""
+        path = path or self.snapshot_path
+        try:
+            snapshot = Snapshot(path)
+        except (OSError, ValueError):
+            return False
+        if snapshot.revision != self._peek_revision():
+            print("题库快照已过期，请重新执行 python -m wkhelper.bank compile")
+            snapshot.close()
+            return False
+        self.snapshot = snapshot
+        return True
+
+    def _get_snapshot(self) -> Snapshot | None:
+        # 首次查询时检查默认位置是否有快照，只检查一次
+        if not self._snapshot_checked:
+            with self._snapshot_lock:
+                if not self._snapshot_checked:
+                    if os.path.exists(self.snapshot_path):
+                        self.open_snapshot()
+                    self._snapshot_checked = True
+        return self.snapshot
+
+    def get_meta(self, key: str) -> str | None:
+        row = (
+            self._reader()
+            .execute("SELECT value FROM meta WHERE key = ?", (key,))
+            .fetchone()
+        )
+        return row[0] if row else None
+
+    def delete_meta(self, key: str):
+        with self.lock:
+            conn = self._writer()
+            with conn:
+                conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+
+    def get_answer(self, library_id: str, version: str) -> list | None:
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            return snapshot.get(str(library_id), str(version))
+
+        key = (str(library_id), str(version))
+        cached = self.cache.get(key)
+        if cached is not _MISSING:
+            return cached
+        since = self.cache.stamp()
+        try:
+            row = (
+                self._reader()
+                .execute(
+                    """
+                    SELECT answer FROM answers
+                    WHERE library_id = ? AND version = ?
+                """,
+                    key,
+                )
+                .fetchone()
+            )
+        except Exception as e:
+            print(f"Error getting answer: {e}")
+            return None
+        answer = decode_answer(row[0]) if row else None
+        self.cache.put(key, answer, since)
+        return answer
+
+    def get_answers_bulk(
+        self, keys: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], list]:
+        """批量查询答案，一次查询解析整份作业（或整门课程）的所有题目"""
+        snapshot = self._get_snapshot()
+        if snapshot is not None:
+            found = {
+                (str(lib), str(ver)): snapshot.get(str(lib), str(ver))
+                for lib, ver in keys
+            }
+            return {key: answer for key, answer in found.items() if answer is not None}
+
+        answers = {}
+        pending = []
+        for key in {(str(lib), str(ver)) for lib, ver in keys}:
+            cached = self.cache.get(key)
+            if cached is _MISSING:
+                pending.append(key)
+            elif cached is not None:
+                answers[key] = cached
+        if not pending:
+            return answers
+
+        since = self.cache.stamp()
+        rows = []
+        try:
+            conn = self._reader()
+            # 每个键占两个参数，分批以避开 SQLite 的参数数量上限
+            for i in range(0, len(pending), 400):
+                chunk = pending[i : i + 400]
+                placeholders = ",".join("(?, ?)" for _ in chunk)
+                rows.extend(
+                    conn.execute(
+                        f"""
+                        SELECT library_id, version, answer FROM answers
+                        WHERE (library_id, version) IN (VALUES {placeholders})
+                    """,
+                        [v for key in chunk for v in key],
+                    ).fetchall()
+                )
+        except Exception as e:
+            print(f"Error getting answers: {e}")
+            return answers
+
+        found = {
+            (library_id, version): decode_answer(answer)
+            for library_id, version, answer in rows
+        }
+        for key in pending:
+            self.cache.put(key, found.get(key), since)
+        answers.update(found)
+        return answers
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats()
+
+    def get_leaf_type_ids(
+        self, platform: str, classroom_id: int | str, leaf_ids: list[int]
+    ) -> dict[int, int]:
+        """批量读取 leaf_id → leaf_type_id 缓存"""
+        if not leaf_ids:
+            return {}
+        result = {}
+        try:
+            conn = self._reader()
+            # SQLite 单条语句的参数数量有限，分批查询
+            for i in range(0, len(leaf_ids), 500):
+                chunk = [str(x) for x in leaf_ids[i : i + 500]]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"""
+                    SELECT leaf_id, leaf_type_id FROM leaf_types
+                    WHERE platform = ? AND classroom_id = ?
+                    AND leaf_id IN ({placeholders})
+                """,
+                    (platform, str(classroom_id), *chunk),
+                ).fetchall()
+                for leaf_id, leaf_type_id in rows:
+                    result[int(leaf_id)] = leaf_type_id
+        except Exception as e:
+            print(f"Error getting leaf types: {e}")
+        return result
 
-    def get_answer(self, library_id: str, version: str) -> list | str | None:
-        table_name = self._get_table_name(library_id)
+    def save_leaf_type_ids(
+        self, platform: str, classroom_id: int | str, mapping: dict[int, int]
+    ):
+        """批量写入 leaf_id → leaf_type_id 缓存"""
+        if not mapping:
+            return
         with self.lock:
             try:
-                self.cursor.execute(
+                conn = self._writer()
+                with conn:
+                    conn.executemany(
+                        """
+                        INSERT OR REPLACE INTO leaf_types
+                        (platform, classroom_id, leaf_id, leaf_type_id)
+                        VALUES (?, ?, ?, ?)
+                    """,
+                        [
+                            (platform, str(classroom_id), str(leaf_id), leaf_type_id)
+                            for leaf_id, leaf_type_id in mapping.items()
+                        ],
+                    )
+            except Exception as e:
+                print(f"Error saving leaf types: {e}")
+
+    def get_harvest_marks(
+        self, platform: str, classroom_id: int | str, leaf_ids: list[int]
+    ) -> dict[int, dict]:
+        """批量读取作业的收集水位，返回 leaf_id → HarvestMark"""
+        if not leaf_ids:
+            return {}
+        result = {}
+        try:
+            conn = self._reader()
+            for i in range(0, len(leaf_ids), 500):
+                chunk = [str(x) for x in leaf_ids[i : i + 500]]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
                     f"""
-                    SELECT answer FROM "{table_name}" 
-                    WHERE version = ?
+                    SELECT leaf_id, fingerprint, content_hash, settled, harvested_at
+                    FROM harvest
+                    WHERE platform = ? AND classroom_id = ?
+                    AND leaf_id IN ({placeholders})
                 """,
-                    (str(version),),
-                )
-                row = self.cursor.fetchone()
-                if row:
-                    try:
-                        return json.loads(row[0])
-                    except Exception:
-                        return row[0]
-            except sqlite3.OperationalError:
-                return None
+                    (platform, str(classroom_id), *chunk),
+                ).fetchall()
+                for leaf_id, fingerprint, digest, settled, harvested_at in rows:
+                    result[int(leaf_id)] = {
+                        "fingerprint": fingerprint,
+                        "content_hash": digest,
+                        "settled": bool(settled),
+                        "harvested_at": harvested_at,
+                    }
+        except Exception as e:
+            print(f"Error getting harvest marks: {e}")
+        return result
+
+    def save_harvest_marks(
+        self, platform: str, marks: list[tuple[int | str, int, dict]]
+    ):
+        """批量写入收集水位，marks 为 (classroom_id, leaf_id, HarvestMark)"""
+        if not marks:
+            return
+        with self.lock:
+            try:
+                conn = self._writer()
+                with conn:
+                    conn.executemany(
+                        """
+                        INSERT OR REPLACE INTO harvest
+                        (platform, classroom_id, leaf_id, fingerprint,
+                         content_hash, settled, harvested_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                        [
+                            (
+                                platform,
+                                str(classroom_id),
+                                str(leaf_id),
+                                mark["fingerprint"],
+                                mark["content_hash"],
+                                int(mark["settled"]),
+                                mark["harvested_at"],
+                            )
+                            for classroom_id, leaf_id, mark in marks
+                        ],
+                    )
             except Exception as e:
-                print(f"Error getting answer: {e}")
-                return None
-            return None
+                print(f"Error saving harvest marks: {e}")
 
 
 db = DB()
@@ -0,0 +1,118 @@
+"""全局限流调度
+
+服务器限流时返回 "Expected available in N second"。以前每个线程各自解析、各自睡眠，
+其余线程照常发送注定被拒绝的请求。现在所有提交、心跳和 GET 都先从这里领取令牌：
+    - 每个接口一个令牌桶，按当前速率放行请求
+    - 任意一次限流响应都会让所有接口暂停到服务器给出的时间点
+    - 速率按 AIMD 自适应：成功一次加性增加，被限流一次乘性减半
+"""
+
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+
+from .utils import log
+
+THROTTLE_RE = re.compile(rb"Expected available in(.+?)second.")
+
+# 接口 -> (初始/最大速率 次/秒, 桶容量)
+# GET 只读且并发量大，速率上限放宽，主要用于限流时一起暂停和降速
+ENDPOINTS = {
+    "submit": (2.0, 5),
+    "heartbeat": (4.0, 5),
+    "get": (20.0, 20),
+}
+MIN_RATE = 0.2
+RATE_INCREASE = 0.05
+RATE_DECREASE = 0.5
+# 被限流后额外多等的秒数
+PAUSE_MARGIN = 0.5
+# 单个请求因限流最多重试的次数
+MAX_THROTTLE_RETRIES = 5
+
+
+def parse_throttle(content: bytes) -> float | None:
+    """在响应字节中查找限流提示，返回需要等待的秒数"""
+    match = THROTTLE_RE.search(content)
+    if match:
+        return float(match.group(1).strip())
+    return None
+
+
+@dataclass
+class _Bucket:
+    max_rate: float
+    capacity: int
+    rate: float = 0.0
+    tokens: float = 0.0
+    updated: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self):
+        self.rate = self.max_rate
+        self.tokens = float(self.capacity)
+
+
+class Governor:
+    def __init__(self, endpoints: dict[str, tuple[float, int]]):
+        self._lock = Lock()
+        self._buckets = {
+            name: _Bucket(rate, capacity) for name, (rate, capacity) in endpoints.items()
+        }
+        self._paused_until = 0.0
+
+    def _reserve(self, endpoint: str) -> float:
+        """预约一个令牌，返回需要等待的秒数（令牌可以透支，按顺序排队）"""
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets[endpoint]
+            if now > bucket.updated:
+                bucket.tokens = min(
+                    bucket.capacity,
+                    bucket.tokens + (now - bucket.updated) * bucket.rate,
+                )
+                bucket.updated = now
+            bucket.tokens -= 1
+            wait = max(0.0, self._paused_until - now)
+            if bucket.tokens < 0:
+                wait += -bucket.tokens / bucket.rate
+            return wait
+
+    def acquire(self, endpoint: str):
+        wait = self._reserve(endpoint)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, endpoint: str):
+        wait = self._reserve(endpoint)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def report_success(self, endpoint: str):
+        with self._lock:
+            bucket = self._buckets[endpoint]
+            bucket.rate = min(bucket.max_rate, bucket.rate + RATE_INCREASE)
+
+    def report_throttle(self, endpoint: str, delay: float):
+        """记录一次限流：全局暂停到服务器给出的时间点，并降低该接口速率
+
+        同一次限流会让多个在途请求同时被拒绝，只有开启新一轮暂停的那次
+        才降低速率并输出日志；暂停期间收到的拒绝只按需延长暂停。
+        """
+        with self._lock:
+            bucket = self._buckets[endpoint]
+            now = time.monotonic()
+            until = now + delay + PAUSE_MARGIN
+            # 暂停期间不积累令牌，恢复后按新速率重新开始
+            bucket.tokens = min(bucket.tokens, 0.0)
+            bucket.updated = max(bucket.updated, until)
+            paused = now < self._paused_until
+            self._paused_until = max(self._paused_until, until)
+            if paused:
+                return
+            bucket.rate = max(MIN_RATE, bucket.rate * RATE_DECREASE)
+        log(f"⚠️  服务器限流，所有请求暂停 {delay} 秒")
+
+
+governor = Governor(ENDPOINTS)
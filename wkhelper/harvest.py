@@ -0,0 +1,81 @@
+"""增量收集答案
+
+每次收集完一个作业都在题库的 harvest 表里记一条水位：
+    fingerprint   作业列表中的元数据（名称、开始/截止时间、是否计分）的摘要
+    content_hash  本次收集到的全部答案的摘要
+    settled       每道题都已回答正确或次数用尽，之后答案不会再变化
+    harvested_at  收集时间（毫秒，与 score_deadline 同单位）
+再次收集时，元数据没变且已定型（或上次收集时已过截止时间）的作业直接跳过，
+不再请求题目列表；需要重新拉取的作业若答案摘要与上次相同，也不再写库。
+"""
+
+import hashlib
+import time
+from typing import Required, TypedDict
+
+from .codec import encode_answer
+from .planner import CORRECT, EXHAUSTED, plan_questions, question_key
+
+
+class HarvestMark(TypedDict):
+    fingerprint: Required[str]
+    content_hash: Required[str]
+    settled: Required[bool]
+    harvested_at: Required[int]
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def homework_fingerprint(hw: dict) -> str:
+    """作业元数据摘要，作业被修改（改名、延期等）时随之变化"""
+    fields = (hw["name"], hw["start_time"], hw["score_deadline"], hw["is_score"])
+    return hashlib.blake2b(repr(fields).encode(), digest_size=8).hexdigest()
+
+
+def collect_answers(questions: list[dict]) -> list[tuple[str, str, list]]:
+    """提取题目中已作答的 (LibraryID, Version, 答案)"""
+    records = []
+    for q in questions:
+        key = question_key(q)
+        answer = (q.get("user") or {}).get("answer")
+        if key and answer:
+            records.append((*key, answer))
+    return records
+
+
+def content_hash(records: list[tuple[str, str, list]]) -> str:
+    """答案集合的摘要，与题目顺序无关"""
+    h = hashlib.blake2b(digest_size=16)
+    for library_id, version, answer in sorted(
+        (library_id, version, encode_answer(answer))
+        for library_id, version, answer in records
+    ):
+        h.update(f"{library_id}\0{version}\0".encode())
+        h.update(answer)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def is_settled(questions: list[dict]) -> bool:
+    """所有题目都已回答正确或次数用尽（没有拿到题目时不算定型）"""
+    plan = plan_questions(questions, {})
+    return bool(plan) and all(item["status"] in (CORRECT, EXHAUSTED) for item in plan)
+
+
+def is_fresh(hw: dict, mark: HarvestMark | None) -> bool:
+    """上次收集之后作业不可能再有新答案"""
+    if mark is None or mark["fingerprint"] != homework_fingerprint(hw):
+        return False
+    deadline = hw["score_deadline"]
+    return mark["settled"] or bool(deadline and deadline < mark["harvested_at"])
+
+
+def make_mark(hw: dict, questions: list[dict], digest: str) -> HarvestMark:
+    return {
+        "fingerprint": homework_fingerprint(hw),
+        "content_hash": digest,
+        "settled": is_settled(questions),
+        "harvested_at": now_ms(),
+    }
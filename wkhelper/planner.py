@@ -0,0 +1,171 @@
+"""答题规划
+
+提交之前先把每道题分类，只有 ANSWERABLE 的题目会进入提交阶段：
+    CORRECT       已经回答正确
+    EXHAUSTED     作答次数已用完
+    ANSWERABLE    题库中有答案，可以提交
+    UNANSWERABLE  缺少 LibraryID/Version/题目ID，或题库中没有答案
+重复运行已完成一部分的课程时，只有剩下的题目会产生请求。
+规划模式只做分类和统计，用来在真正答题之前估算题库覆盖率、请求数和耗时。
+"""
+
+from collections.abc import Iterable
+from typing import Any, Required, TypedDict
+
+from .aio import SUBMIT_CONCURRENCY
+from .governor import ENDPOINTS
+from .utils import log
+
+CORRECT = "correct"
+EXHAUSTED = "exhausted"
+ANSWERABLE = "answerable"
+UNANSWERABLE = "unanswerable"
+
+# 单次提交的平均耗时：提交后 3-4 秒的随机间隔加上请求本身
+SUBMIT_SECONDS = 4.0
+
+
+class PlannedQuestion(TypedDict):
+    index: Required[int]
+    status: Required[str]
+    reason: Required[str]
+    key: Required[tuple[str, str] | None]
+    problem_id: Required[int | None]
+    answer: Required[list[str] | None]
+
+
+def question_key(q: dict) -> tuple[str, str] | None:
+    """提取题目在题库中的 (LibraryID, Version)"""
+    content = q.get("content") or {}
+    library_id = content.get("LibraryID") or content.get("library_id")
+    version = content.get("Version")
+    if not library_id or not version:
+        return None
+    return str(library_id), str(version)
+
+
+def plan_questions(
+    questions: list[dict], answers: dict[tuple[str, str], Any]
+) -> list[PlannedQuestion]:
+    """按题库查询结果给每道题分类，answers 为 get_answers_bulk 的返回值"""
+    plan: list[PlannedQuestion] = []
+    for i, q in enumerate(questions, 1):
+        user = q.get("user") or {}
+        key = question_key(q)
+        problem_id = q.get("problem_id") or q.get("id")
+        answer = answers.get(key) if key else None
+
+        if user.get("is_right"):
+            status, reason = CORRECT, "已回答正确"
+        elif user.get("my_count", 0) >= q.get("max_retry", 1):
+            status, reason = EXHAUSTED, "达到最大回答次数"
+        elif not key:
+            status, reason = UNANSWERABLE, "无法获取 LibraryID 或 Version"
+        elif not answer:
+            status, reason = UNANSWERABLE, f"无答案 (LibID: {key[0]}, Ver: {key[1]})"
+        elif problem_id is None:
+            status, reason = UNANSWERABLE, "无法获取题目ID"
+        else:
+            status, reason = ANSWERABLE, ""
+
+        plan.append({
+            "index": i,
+            "status": status,
+            "reason": reason,
+            "key": key,
+            "problem_id": problem_id,
+            "answer": answer,
+        })
+    return plan
+
+
+def count_by_status(plan: list[PlannedQuestion]) -> dict[str, int]:
+    counts = merge_counts()
+    for item in plan:
+        counts[item["status"]] += 1
+    return counts
+
+
+def coverage(counts: dict[str, int]) -> float:
+    """题库覆盖率：仍需作答的题目中，题库能回答的比例"""
+    remaining = counts[ANSWERABLE] + counts[UNANSWERABLE]
+    return counts[ANSWERABLE] / remaining if remaining else 1.0
+
+
+def estimate_requests(counts: dict[str, int], homeworks: int) -> int:
+    """预计请求数：每个作业拉取一次题目列表，每道可提交的题目提交一次"""
+    return homeworks + counts[ANSWERABLE]
+
+
+def estimate_seconds(submits: int) -> float:
+    """预计耗时：受提交并发与限流速率两者中较慢的一方约束"""
+    by_concurrency = submits * SUBMIT_SECONDS / SUBMIT_CONCURRENCY
+    by_rate = submits / ENDPOINTS["submit"][0]
+    return max(by_concurrency, by_rate)
+
+
+def format_counts(counts: dict[str, int]) -> str:
+    return (
+        f"已正确 {counts[CORRECT]}，次数用尽 {counts[EXHAUSTED]}，"
+        f"可提交 {counts[ANSWERABLE]}，无法作答 {counts[UNANSWERABLE]}，"
+        f"覆盖率 {coverage(counts) * 100:.1f}%"
+    )
+
+
+def merge_counts(*counts: dict[str, int]) -> dict[str, int]:
+    total = dict.fromkeys((CORRECT, EXHAUSTED, ANSWERABLE, UNANSWERABLE), 0)
+    for c in counts:
+        for status, n in c.items():
+            total[status] += n
+    return total
+
+
+def bank_keys(question_lists: Iterable[list[dict]]) -> list[tuple[str, str]]:
+    """所有题目去重后的 (LibraryID, Version)，用于一次批量查询题库"""
+    keys = {key for questions in question_lists for key in map(question_key, questions)}
+    keys.discard(None)
+    return list(keys)
+
+
+def _estimate(counts: dict[str, int], homeworks: int) -> str:
+    return (
+        f"预计 {estimate_requests(counts, homeworks)} 次请求，"
+        f"约 {estimate_seconds(counts[ANSWERABLE]) / 60:.1f} 分钟"
+    )
+
+
+def report_plan(
+    courses: list[tuple[str, list[tuple[dict, list[dict]]]]],
+    answers: dict[tuple[str, str], Any],
+):
+    """输出规划报告，courses 为 [(课程名, [(作业, 题目列表)])]"""
+    course_totals = []
+    homework_count = 0
+    for name, homeworks in courses:
+        log(f"\n🧭 {name}")
+        hw_counts = []
+        for hw, questions in homeworks:
+            counts = count_by_status(plan_questions(questions, answers))
+            hw_counts.append(counts)
+            log(f"  {hw['name']}: {format_counts(counts)}")
+
+        total = merge_counts(*hw_counts)
+        course_totals.append(total)
+        homework_count += len(homeworks)
+        log(f"  📊 合计 {format_counts(total)}，{_estimate(total, len(homeworks))}")
+
+    total = merge_counts(*course_totals)
+    log(
+        f"\n📊 全部 {len(courses)} 门课程: {format_counts(total)}，"
+        f"{_estimate(total, homework_count)}"
+    )
+
+
+def report_cache(stats: dict):
+    """输出题库答案缓存的命中情况（本进程累计，走快照的查询不经过缓存）"""
+    lookups = stats["hits"] + stats["misses"]
+    if lookups:
+        log(
+            f"🗃️ 答案缓存命中 {stats['hits']}/{lookups}"
+            f"（{stats['hits'] / lookups:.0%}），当前缓存 {stats['size']} 条"
+        )
@@ -0,0 +1,60 @@
+import json
+import os
+import time
+from threading import Lock
+
+SESSION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.json")
+# sessionid 服务端有效期约两周，本地保守按 7 天过期
+SESSION_TTL = 7 * 24 * 3600
+
+_lock = Lock()
+
+
+def _read_all() -> dict:
+    try:
+        with open(SESSION_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_all(data: dict):
+    tmp_path = f"{SESSION_FILE}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, SESSION_FILE)
+
+
+def load_session(platform: str) -> dict | None:
+    """读取未过期的本地登录状态 (csrftoken / sessionid)"""
+    with _lock:
+        entry = _read_all().get(platform)
+    if not entry or entry.get("expires_at", 0) <= time.time():
+        return None
+    cookies = entry.get("cookies", {})
+    if not cookies.get("csrftoken") or not cookies.get("sessionid"):
+        return None
+    return cookies
+
+
+def save_session(platform: str, cookies: dict, ttl: int = SESSION_TTL):
+    """保存登录状态，供下次启动复用"""
+    with _lock:
+        data = _read_all()
+        data[platform] = {
+            "cookies": {
+                "csrftoken": cookies["csrftoken"],
+                "sessionid": cookies["sessionid"],
+            },
+            "expires_at": time.time() + ttl,
+        }
+        _write_all(data)
+
+
+def clear_session(platform: str):
+    """删除失效的登录状态"""
+    with _lock:
+        data = _read_all()
+        if data.pop(platform, None) is not None:
+            _write_all(data)
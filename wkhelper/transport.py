@@ -0,0 +1,223 @@
+"""HTTP 传输层
+
+所有平台接口都通过这里发请求：
+    - 连接池大小与 IO 线程数一致，每个工作线程都有可复用的长连接
+    - 默认的连接/读取超时，避免一条卡死的 TCP 连接永久占住线程
+    - GET 是幂等的，遇到网络错误或 5xx 时按带抖动的指数退避重试；
+      POST（提交答案、心跳）只发送一次，避免重复提交
+    - GET 同样经过 governor：全局暂停期间不发出，被限流时暂停所有请求后重试
+    - 只读的 JSON GET 可以走 get_json：相同的请求在途时合并为一次网络调用，
+      结果在短时间内直接复用（single-flight），可按请求指定更长的复用时间，
+      数据会被自己的写操作改变时用 forget_json 丢弃
+    - 响应统一用 decode_json 直接解析字节，安装了 orjson 时自动使用
+以后要换成别的 HTTP 客户端，只需要改这个模块。
+"""
+
+import json
+import random
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .aio import IO_WORKERS
+from .governor import governor, parse_throttle
+from .utils import log
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 20
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# 连接池大小，与并发执行请求的线程数一致
+POOL_SIZE = IO_WORKERS
+
+GET_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+RETRY_STATUS = frozenset({500, 502, 503, 504})
+# 服务端明确拒绝登录状态的状态码
+AUTH_STATUS = frozenset({401, 403})
+
+# 合并请求的结果复用时间（秒）
+SINGLE_FLIGHT_TTL = 5.0
+# 缓存条目超过该数量时清理过期结果
+SINGLE_FLIGHT_PURGE = 1024
+
+
+def loads(data: bytes) -> Any:
+    """解析 JSON 字节"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode_json(response: requests.Response) -> Any:
+    """直接解析响应字节，跳过 response.text 的字符集探测和整段 str 解码"""
+    return loads(response.content)
+
+
+def build_session(headers: dict, cookies: dict) -> requests.Session:
+    """创建带连接池配置的会话"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(headers)
+    session.cookies.update(cookies)
+    return session
+
+
+def _backoff(attempt: int) -> float:
+    """第 attempt 次重试前的等待秒数（full jitter）"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def http_get(
+    session: requests.Session, url: str, retries: int = GET_RETRIES, **kwargs
+) -> requests.Response:
+    """带超时与重试的 GET，发送前向 governor 领取令牌"""
+    kwargs.setdefault("timeout", TIMEOUT)
+    attempt = 0
+    while True:
+        governor.acquire("get")
+        try:
+            response = session.get(url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= retries:
+                raise
+            reason = type(e).__name__
+        else:
+            throttle = parse_throttle(response.content)
+            if throttle is not None:
+                governor.report_throttle("get", throttle)
+                if attempt >= retries:
+                    return response
+                # 下一次 acquire 会等到全局暂停结束，不再额外退避
+                attempt += 1
+                continue
+            governor.report_success("get")
+            if response.status_code not in RETRY_STATUS or attempt >= retries:
+                return response
+            reason = f"HTTP {response.status_code}"
+
+        delay = _backoff(attempt)
+        attempt += 1
+        log(f"🔁 请求失败（{reason}），{delay:.1f} 秒后第 {attempt} 次重试")
+        time.sleep(delay)
+
+
+def http_post(session: requests.Session, url: str, **kwargs) -> requests.Response:
+    """带超时的 POST，不自动重试"""
+    kwargs.setdefault("timeout", TIMEOUT)
+    return session.post(url, **kwargs)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "finished", "ttl")
+
+    def __init__(self, ttl: float):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+        self.finished = 0.0
+        self.ttl = ttl
+
+
+class SingleFlight:
+    """相同 key 的调用在途时只执行一次，其余调用方等待并共享同一结果"""
+
+    def __init__(self, ttl: float = SINGLE_FLIGHT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._calls: dict[tuple, _Call] = {}
+
+    def do(self, key: tuple, func: Callable[[], Any], ttl: float | None = None) -> Any:
+        """ttl 为本次结果的复用时间，默认使用实例的 ttl"""
+        with self._lock:
+            now = time.monotonic()
+            call = self._calls.get(key)
+            if call is not None and (
+                not call.done.is_set() or now - call.finished < call.ttl
+            ):
+                owner = False
+            else:
+                if len(self._calls) >= SINGLE_FLIGHT_PURGE:
+                    self._purge(now)
+                call = self._calls[key] = _Call(self.ttl if ttl is None else ttl)
+                owner = True
+
+        if not owner:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                call.finished = time.monotonic()
+                # 失败的结果不缓存，下一次调用重新请求
+                if call.error is not None and self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def forget(self, key: tuple):
+        """丢弃已完成的结果，下一次调用重新执行；在途的调用不受影响"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.done.is_set():
+                del self._calls[key]
+
+    def _purge(self, now: float):
+        expired = [
+            key
+            for key, call in self._calls.items()
+            if call.done.is_set() and now - call.finished >= call.ttl
+        ]
+        for key in expired:
+            del self._calls[key]
+
+
+_flights = SingleFlight()
+
+
+def _flight_key(session: requests.Session, url: str, scope: object, kwargs: dict):
+    owner = session if scope is None else scope
+    return (id(owner), url, json.dumps(kwargs, sort_keys=True, default=str))
+
+
+def get_json(
+    session: requests.Session,
+    url: str,
+    scope: object = None,
+    ttl: float | None = None,
+    **kwargs,
+) -> Any:
+    """合并相同请求的 JSON GET，返回的对象被多个调用方共享，只读使用
+
+    默认只合并同一会话上的请求；多个会话代表同一身份时（如课程上下文的
+    各线程会话），传入相同的 scope 即可跨会话合并。ttl 为结果复用时间，
+    默认 SINGLE_FLIGHT_TTL。
+    """
+    key = _flight_key(session, url, scope, kwargs)
+    return _flights.do(
+        key, lambda: decode_json(http_get(session, url, **kwargs)), ttl
+    )
+
+
+def forget_json(session: requests.Session, url: str, scope: object = None, **kwargs):
+    """丢弃 get_json 复用中的结果，参数与对应的 get_json 调用一致"""
+    _flights.forget(_flight_key(session, url, scope, kwargs))
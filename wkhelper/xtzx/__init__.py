@@ -1 +1,6 @@
-from .main import main as main
+def __getattr__(name: str):
+    if name == "main":
+        from .main import main
+
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
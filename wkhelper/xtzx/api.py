@@ -1,17 +1,34 @@
-import json
+import asyncio
 import random
-import re
-import time
 
 import requests
 
+from ..aio import run_io
+from ..codec import submit_answer
+from ..course_index import LEAF_HOMEWORK, LEAF_VIDEO, CourseIndex, load_course_index
+from ..db import db
+from ..governor import MAX_THROTTLE_RETRIES, governor, parse_throttle
+from ..transport import (
+    decode_json,
+    forget_json,
+    get_json,
+    http_get,
+    http_post,
+)
 from ..utils import log
 from .models import ClassroomInfo, Course, Homework, Question, SubmitResult, UserInfo
 
+# 题目列表的复用时间（秒）：规划之后紧接着答题或收集答案时不再重复下载。
+# 答题、收集答案取到题目后立即由 forget_homework_questions 丢弃，
+# 只有规划模式取到的题目列表会保留到过期
+QUESTIONS_TTL = 300.0
+
 
 def get_basic_info(session: requests.Session) -> UserInfo:
-    response = session.get("https://www.xuetangx.com/api/v1/u/user/basic_profile/")
-    resp = json.loads(response.text)
+    response = http_get(
+        session, "https://www.xuetangx.com/api/v1/u/user/basic_profile/"
+    )
+    resp = decode_json(response)
     if not resp["success"]:
         log("❌ 获取用户信息失败！")
         exit(1)
@@ -21,8 +38,8 @@ def get_basic_info(session: requests.Session) -> UserInfo:
 
 def get_courses(session: requests.Session) -> list[Course]:
     url = "https://www.xuetangx.com/api/v1/lms/user/user-courses/?status=1&page=1"
-    response = session.get(url)
-    resp = json.loads(response.text)
+    response = http_get(session, url)
+    resp = decode_json(response)
     if not resp["success"]:
         log("❌ 获取课程列表失败！")
         exit(1)
@@ -43,32 +60,30 @@ def get_courses(session: requests.Session) -> list[Course]:
         exit(1)
 
 
-def _iter_leaves(chapter_data: list[dict]):
-    for chapter in chapter_data:
-        if "section_leaf_list" in chapter:
-            for section in chapter["section_leaf_list"]:
-                yield from section.get("leaf_list", [section])
-
-
 def get_chapter_data(course: Course, session: requests.Session) -> list[dict]:
     url = f"https://www.xuetangx.com/api/v1/lms/learn/course/chapter?cid={course['classroom_id']}&sign={course['sign']}"
     try:
-        response = session.get(url)
-        return json.loads(response.text)["data"]["course_chapter"]
+        response = http_get(session, url)
+        return decode_json(response)["data"]["course_chapter"]
     except Exception:
         log("❌ 获取章节信息失败！")
         exit(1)
 
 
+def get_course_index(course: Course, session: requests.Session) -> CourseIndex:
+    """获取课程索引（章节树只拉取一次，按 TTL 缓存）"""
+    return load_course_index(
+        "xtzx",
+        course["classroom_id"],
+        lambda: (get_chapter_data(course, session), None),
+    )
+
+
 def get_videos(
     course: Course, session: requests.Session
 ) -> tuple[dict[int, str], requests.Session]:
-    data = get_chapter_data(course, session)
-    videos = {
-        leaf["id"]: leaf["name"]
-        for leaf in _iter_leaves(data)
-        if leaf.get("leaf_type") == 0
-    }
+    index = get_course_index(course, session)
+    videos = {leaf["id"]: leaf["name"] for leaf in index.leaves(LEAF_VIDEO)}
 
     log(f"📋 找到 {len(videos)} 个视频")
     return videos, session
@@ -78,19 +93,18 @@ def get_homeworks(
     course: Course, session: requests.Session
 ) -> tuple[list[Homework], requests.Session, ClassroomInfo]:
     """获取课程中的课堂作业（leaf_type == 6）"""
-    data = get_chapter_data(course, session)
+    index = get_course_index(course, session)
 
     homeworks: list[Homework] = [
         {
             "id": leaf["id"],
             "name": leaf["name"],
-            "start_time": leaf.get("start_time"),
-            "score_deadline": leaf.get("score_deadline"),
-            "is_score": leaf.get("is_score"),
-            "chapter_id": leaf.get("chapter_id"),
+            "start_time": leaf["start_time"],
+            "score_deadline": leaf["score_deadline"],
+            "is_score": leaf["is_score"],
+            "chapter_id": leaf["chapter_id"],
         }
-        for leaf in _iter_leaves(data)
-        if leaf.get("leaf_type") == 6
+        for leaf in index.leaves(LEAF_HOMEWORK)
     ]
 
     log(f"📋 找到 {len(homeworks)} 个课堂作业")
@@ -110,8 +124,7 @@ def get_leaf_type_id(
     """获取 leaf 信息，提取 leaf_type_id"""
     url = f"https://www.xuetangx.com/api/v1/lms/learn/leaf_info/{course['classroom_id']}/{leaf_id}/?sign={course['sign']}"
     try:
-        response = session.get(url)
-        data = json.loads(response.text)
+        data = get_json(session, url)
         if data.get("success") or data.get("data"):
             return data.get("data", {}).get("content_info", {}).get("leaf_type_id")
         return None
@@ -120,74 +133,223 @@ def get_leaf_type_id(
         return None
 
 
+def _questions_url(homework_id: int) -> str:
+    return f"https://www.xuetangx.com/api/v1/lms/exercise/get_exercise_list/{homework_id}/"
+
+
 def get_homework_questions(
     homework_id: int, course: Course, session: requests.Session
 ) -> list[Question]:
-    """获取作业题目列表"""
-    url = (
-        f"https://www.xuetangx.com/api/v1/lms/exercise/get_exercise_list/{homework_id}/"
-    )
+    """获取作业题目列表，QUESTIONS_TTL 内重复获取直接复用，返回值只读"""
+    url = _questions_url(homework_id)
     try:
-        response = session.get(url)
-        data = json.loads(response.text)
+        data = get_json(session, url, ttl=QUESTIONS_TTL)
         if data.get("success", False):
             return data.get("data", {}).get("problems", [])
+        forget_json(session, url)
         return []
     except Exception as e:
         log(f"❌ 获取作业题目失败！错误: {e}")
         return []
 
 
-def submit_homework_answer(
+def forget_homework_questions(homework_id: int, session: requests.Session):
+    """丢弃复用中的题目列表，开始提交前调用，之后的获取拿到最新的作答状态"""
+    forget_json(session, _questions_url(homework_id))
+
+
+def _post_answer(
+    payload: dict, session: requests.Session
+) -> tuple[float | None, SubmitResult]:
+    """发送一次答案提交请求，返回 (限流等待秒数, 提交结果)"""
+    url = "https://www.xuetangx.com/api/v1/lms/exercise/problem_apply/"
+    response = http_post(session, url, json=payload)
+
+    delay = parse_throttle(response.content)
+    if delay is not None:
+        return delay, {"success": False, "is_correct": False, "correct_answer": []}
+
+    data = decode_json(response)
+    if data.get("success") is True:
+        result_data = data.get("data", {})
+        return None, {
+            "success": True,
+            "is_correct": result_data.get(
+                "is_right", result_data.get("is_correct", False)
+            ),
+            "correct_answer": result_data.get("answer", []),
+        }
+    return None, {"success": False, "is_correct": False, "correct_answer": []}
+
+
+def _answer_payload(
     leaf_id: int,
     exercise_id: int,
     problem_id: int,
     answer: str | list,
     course_info: ClassroomInfo,
-    session: requests.Session,
-) -> SubmitResult:
-    """提交单个题目答案，返回提交结果详情"""
-    url = "https://www.xuetangx.com/api/v1/lms/exercise/problem_apply/"
-
-    # 确保 answer 是列表格式
-    if isinstance(answer, str):
-        answer = [answer]
-
-    payload = {
+) -> dict:
+    return {
         "classroom_id": course_info["id"],
         "problem_id": problem_id,
         "leaf_id": leaf_id,
         "exercise_id": exercise_id,
         "sign": course_info["course_sign"],
-        "answer": answer,
+        "answer": submit_answer(answer),
+    }
+
+
+def get_video_info(
+    classroom_id: int | str,
+    video_id: int | str,
+    course_sign: str,
+    session: requests.Session,
+) -> dict:
+    """获取视频所属的 user_id / sku_id / course_id"""
+    data = get_json(
+        session,
+        f"https://www.xuetangx.com/api/v1/lms/learn/leaf_info/{classroom_id}/{video_id}/?sign={course_sign}",
+    )["data"]
+    return {
+        "user_id": data["user_id"],
+        "sku_id": data["sku_id"],
+        "course_id": data["course_id"],
     }
 
+
+def get_video_progress(
+    course_id: int,
+    user_id: int,
+    classroom_id: int | str,
+    video_id: int | str,
+    session: requests.Session,
+) -> dict | None:
+    """获取视频观看进度，失败时返回 None"""
+    url = f"https://www.xuetangx.com/video-log/get_video_watch_progress/??cid={course_id}&user_id={user_id}&classroom_id={classroom_id}&video_type=video&vtype=rate&video_id={video_id}"
     try:
-        while True:
-            response = session.post(url, json=payload)
-
-            # 检查是否被限流
-            match = re.search(r"Expected available in(.+?)second.", response.text)
-            if match:
-                delay_time = match.group(1).strip()
-                log(f"⚠️  服务器限流，需等待 {delay_time} 秒")
-                time.sleep(float(delay_time) + 0.5)
-                log("🔄 重新提交答案...")
-                continue
-
-            data = json.loads(response.text)
-            if data.get("success") is True:
-                result_data = data.get("data", {})
-                # 添加3-4秒随机延迟，模拟人工操作
-                time.sleep(random.uniform(3, 4))
-                return {
-                    "success": True,
-                    "is_correct": result_data.get(
-                        "is_right", result_data.get("is_correct", False)
-                    ),
-                    "correct_answer": result_data.get("answer", []),
-                }
-            return {"success": False, "is_correct": False, "correct_answer": []}
+        response = http_get(session, url)
+        return decode_json(response)["data"][str(video_id)]
+    except Exception:
+        return None
+
+
+def send_heartbeat(heart_data: list[dict], session: requests.Session) -> float | None:
+    """发送视频心跳，被限流时返回需要等待的秒数"""
+    url = "https://www.xuetangx.com/video-log/heartbeat/"
+    response = http_post(session, url, json={"heart_data": heart_data})
+    return parse_throttle(response.content)
+
+
+# ---- 异步接口：阻塞请求在 IO 线程池执行，等待由协程承担 ----
+
+
+async def aget_videos(
+    course: Course, session: requests.Session
+) -> tuple[dict[int, str], requests.Session]:
+    return await run_io(get_videos, course, session)
+
+
+async def aget_homeworks(
+    course: Course, session: requests.Session
+) -> tuple[list[Homework], requests.Session, ClassroomInfo]:
+    return await run_io(get_homeworks, course, session)
+
+
+async def awarm_leaf_type_ids(
+    course: Course, leaf_ids: list[int], session: requests.Session
+) -> dict[int, int]:
+    """批量解析 leaf_type_id：先查本地缓存，缺失的在共享 IO 线程池中并发请求后一次性写回"""
+    resolved = await run_io(
+        db.get_leaf_type_ids, "xtzx", course["classroom_id"], leaf_ids
+    )
+    missing = [leaf_id for leaf_id in leaf_ids if leaf_id not in resolved]
+    if not missing:
+        return resolved
+
+    results = await asyncio.gather(
+        *(run_io(get_leaf_type_id, course, leaf_id, session) for leaf_id in missing)
+    )
+    fetched = {
+        leaf_id: leaf_type_id
+        for leaf_id, leaf_type_id in zip(missing, results)
+        if leaf_type_id
+    }
+    await run_io(db.save_leaf_type_ids, "xtzx", course["classroom_id"], fetched)
+    resolved.update(fetched)
+    return resolved
+
+
+async def aresolve_leaf_type_id(
+    course: Course, leaf_id: int, session: requests.Session
+) -> int | None:
+    return (await awarm_leaf_type_ids(course, [leaf_id], session)).get(leaf_id)
+
+
+async def aget_homework_questions(
+    homework_id: int, course: Course, session: requests.Session
+) -> list[Question]:
+    return await run_io(get_homework_questions, homework_id, course, session)
+
+
+async def aget_video_info(
+    classroom_id: int | str,
+    video_id: int | str,
+    course_sign: str,
+    session: requests.Session,
+) -> dict:
+    return await run_io(get_video_info, classroom_id, video_id, course_sign, session)
+
+
+async def aget_video_progress(
+    course_id: int,
+    user_id: int,
+    classroom_id: int | str,
+    video_id: int | str,
+    session: requests.Session,
+) -> dict | None:
+    return await run_io(
+        get_video_progress, course_id, user_id, classroom_id, video_id, session
+    )
+
+
+async def asend_heartbeat(
+    heart_data: list[dict], session: requests.Session
+) -> bool:
+    """发送视频心跳，被限流时等待 governor 放行后重试，返回是否发送成功"""
+    for _ in range(MAX_THROTTLE_RETRIES):
+        await governor.aacquire("heartbeat")
+        delay = await run_io(send_heartbeat, heart_data, session)
+        if delay is None:
+            governor.report_success("heartbeat")
+            return True
+        governor.report_throttle("heartbeat", delay)
+    return False
+
+
+async def asubmit_homework_answer(
+    leaf_id: int,
+    exercise_id: int,
+    problem_id: int,
+    answer: str | list,
+    course_info: ClassroomInfo,
+    session: requests.Session,
+) -> SubmitResult:
+    """提交单个题目答案（异步），限流等待与提交间隔不占用线程"""
+    payload = _answer_payload(leaf_id, exercise_id, problem_id, answer, course_info)
+
+    try:
+        for _ in range(MAX_THROTTLE_RETRIES):
+            await governor.aacquire("submit")
+            delay, result = await run_io(_post_answer, payload, session)
+            if delay is None:
+                governor.report_success("submit")
+                if result["success"]:
+                    # 添加3-4秒随机延迟，模拟人工操作
+                    await asyncio.sleep(random.uniform(3, 4))
+                return result
+            governor.report_throttle("submit", delay)
+        log("❌ 提交答案失败！多次被服务器限流")
+        return {"success": False, "is_correct": False, "correct_answer": []}
     except Exception as e:
         log(f"❌ 提交答案失败！错误: {e}")
         return {"success": False, "is_correct": False, "correct_answer": []}
@@ -1,23 +1,30 @@
 import json
 from io import BytesIO
 
-import qrcode
 import requests
-import websocket
-from PIL import Image
-from pyzbar.pyzbar import decode
 
+from ..session_store import clear_session, load_session, save_session
+from ..transport import AUTH_STATUS, build_session, decode_json, http_get, http_post
 from ..utils import log
+from .api import get_basic_info
+from .models import UserInfo
 
 
 def get_cookie() -> dict:
     """扫码登录获取Cookie"""
+    # 仅在需要扫码时导入二维码、图像识别与 websocket 依赖
+    import qrcode
+    import websocket
+    from PIL import Image
+    from pyzbar.pyzbar import decode
+
     login_data = {}
 
     def on_message(ws, message):
         msg = json.loads(message)
         if "ticket" in msg and msg["ticket"]:
-            resp = requests.get(msg["ticket"])
+            with requests.Session() as session:
+                resp = http_get(session, msg["ticket"])
             img = Image.open(BytesIO(resp.content))
 
             url = decode(img)[0].data.decode("utf-8")
@@ -47,30 +54,32 @@ def get_cookie() -> dict:
     )
     ws.run_forever()
 
-    response = requests.post(
-        "https://www.xuetangx.com/api/v1/u/login/wx/",
-        json={
-            "s_s": login_data["token"],
-            "preset_properties": {
-                "$timezone_offset": -480,
-                "$screen_height": 1067,
-                "$screen_width": 1707,
-                "$lib": "js",
-                "$lib_version": "1.19.14",
-                "$latest_traffic_source_type": "直接流量",
-                "$latest_search_keyword": "未取到值_直接打开",
-                "$latest_referrer": "",
-                "$is_first_day": False,
-                "$referrer": "https://www.xuetangx.com/",
-                "$referrer_host": "www.xuetangx.com",
-                "$url": "https://www.xuetangx.com/",
-                "$url_path": "/",
-                "$title": "学堂在线 - 精品在线课程学习平台",
-                "_distinct_id": "19a16647ffb7cf-0590d22341cefa4-4c657b58-1821369-19a16647ffc129c",
+    with requests.Session() as session:
+        response = http_post(
+            session,
+            "https://www.xuetangx.com/api/v1/u/login/wx/",
+            json={
+                "s_s": login_data["token"],
+                "preset_properties": {
+                    "$timezone_offset": -480,
+                    "$screen_height": 1067,
+                    "$screen_width": 1707,
+                    "$lib": "js",
+                    "$lib_version": "1.19.14",
+                    "$latest_traffic_source_type": "直接流量",
+                    "$latest_search_keyword": "未取到值_直接打开",
+                    "$latest_referrer": "",
+                    "$is_first_day": False,
+                    "$referrer": "https://www.xuetangx.com/",
+                    "$referrer_host": "www.xuetangx.com",
+                    "$url": "https://www.xuetangx.com/",
+                    "$url_path": "/",
+                    "$title": "学堂在线 - 精品在线课程学习平台",
+                    "_distinct_id": "19a16647ffb7cf-0590d22341cefa4-4c657b58-1821369-19a16647ffc129c",
+                },
+                "page_name": "首页",
             },
-            "page_name": "首页",
-        },
-    )
+        )
 
     return {
         "csrftoken": response.cookies.get("csrftoken", ""),
@@ -78,7 +87,47 @@ def get_cookie() -> dict:
     }
 
 
-def init_session() -> requests.Session:
+def _build_session(cookies: dict) -> requests.Session:
+    return build_session(
+        {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Content-Type": "application/json",
+            "X-CSRFToken": cookies["csrftoken"],
+            "Xtbz": "xt",
+        },
+        cookies,
+    )
+
+
+def _load_user_info(session: requests.Session) -> UserInfo | None:
+    """用 basic_profile 接口校验登录状态，有效时返回用户信息，服务端拒绝时返回 None
+
+    网络错误由 http_get 重试，仍然失败时直接抛出，不会误删本地登录状态
+    """
+    response = http_get(
+        session, "https://www.xuetangx.com/api/v1/u/user/basic_profile/"
+    )
+    if response.status_code in AUTH_STATUS:
+        return None
+    response.raise_for_status()
+    resp = decode_json(response)
+    if not resp.get("success"):
+        return None
+    return resp["data"]
+
+
+def init_session() -> tuple[requests.Session, UserInfo]:
+    """返回 (会话, 当前用户信息)"""
+    cookies = load_session("xtzx")
+    if cookies:
+        session = _build_session(cookies)
+        userinfo = _load_user_info(session)
+        if userinfo is not None:
+            log("✅ 已复用本地登录状态")
+            return session, userinfo
+        log("⚠️ 本地登录状态已失效，重新扫码登录")
+        clear_session("xtzx")
+
     log("🔐 正在获取学堂在线Cookie...")
     cookies = get_cookie()
 
@@ -87,13 +136,7 @@ def init_session() -> requests.Session:
         exit(1)
 
     log("✅ Cookie获取成功！")
+    save_session("xtzx", cookies)
 
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-        "Content-Type": "application/json",
-        "X-CSRFToken": cookies["csrftoken"],
-        "Xtbz": "xt",
-    })
-    session.cookies.update(cookies)
-    return session
+    session = _build_session(cookies)
+    return session, get_basic_info(session)
@@ -1,25 +1,59 @@
-import json
+import asyncio
 import random
-import re
 import time
-from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import requests
 
+from ..aio import (
+    SUBMIT_CONCURRENCY,
+    BatchWriter,
+    run,
+    run_io,
+    run_pipeline,
+    scheduler,
+    submit_scheduler,
+)
 from ..db import db
+from ..harvest import (
+    HarvestMark,
+    collect_answers,
+    content_hash,
+    is_fresh,
+    make_mark,
+)
+from ..planner import (
+    ANSWERABLE,
+    UNANSWERABLE,
+    bank_keys,
+    count_by_status,
+    format_counts,
+    plan_questions,
+    question_key,
+    report_cache,
+    report_plan,
+)
 from ..utils import get_input, log
 from .api import (
-    get_homework_questions,
-    get_homeworks,
-    get_leaf_type_id,
-    get_videos,
-    submit_homework_answer,
+    aget_homework_questions,
+    aget_homeworks,
+    aget_video_info,
+    aget_video_progress,
+    aget_videos,
+    aresolve_leaf_type_id,
+    asend_heartbeat,
+    asubmit_homework_answer,
+    awarm_leaf_type_ids,
+    forget_homework_questions,
 )
-from .models import ClassroomInfo, Course, Homework
+from .models import ClassroomInfo, Course, Homework, Question
+
+# 答题流水线各阶段的并发数（提交阶段使用 SUBMIT_CONCURRENCY）
+FETCH_CONCURRENCY = 5
+LOOKUP_CONCURRENCY = 2
 
 
-def watch_video(
+async def awatch_video(
     video_id: int | str,
     video_name: str,
     classroom_id: int | str,
@@ -28,19 +62,15 @@ def watch_video(
 ):
     video_id = str(video_id)
 
-    resp = session.get(
-        f"https://www.xuetangx.com/api/v1/lms/learn/leaf_info/{classroom_id}/{video_id}/?sign={course_sign}"
-    )
-
-    data = resp.json()["data"]
+    info = await aget_video_info(classroom_id, video_id, course_sign, session)
+    user_id = info["user_id"]
+    sku_id = info["sku_id"]
+    course_id = info["course_id"]
 
-    user_id = data["user_id"]
-    sku_id = data["sku_id"]
-    course_id = data["course_id"]
-    progress_url = f"https://www.xuetangx.com/video-log/get_video_watch_progress/??cid={course_id}&user_id={user_id}&classroom_id={classroom_id}&video_type=video&vtype=rate&video_id={video_id}"
-
-    response = session.get(progress_url)
-    if '"completed":1' in response.text:
+    progress = await aget_video_progress(
+        course_id, user_id, classroom_id, video_id, session
+    )
+    if progress and progress.get("completed") == 1:
         log(f"⏭️  {video_name} 已完成，跳过")
         return
 
@@ -48,14 +78,10 @@ def watch_video(
 
     video_frame = 0
     rate = 0
-    try:
-        data = json.loads(response.text)["data"][video_id]
-        rate = data.get("rate", 0) or 0
-        video_frame = data.get("watch_length", 0)
-    except Exception:
-        pass
-
-    heartbeat_url = "https://www.xuetangx.com/video-log/heartbeat/"
+    if progress:
+        rate = progress.get("rate", 0) or 0
+        video_frame = progress.get("watch_length", 0)
+
     timestamp = int(time.time() * 1000)
 
     LEARNING_RATE = 8
@@ -89,122 +115,126 @@ def watch_video(
         ]
 
         video_frame += LEARNING_RATE * 3
-        r = session.post(heartbeat_url, json={"heart_data": heart_data})
 
         try:
-            match = re.search(r"Expected available in(.+?)second.", r.text)
-            if match:
-                delay_time = match.group(1).strip()
-                log(f"⚠️  服务器限流，需等待 {delay_time} 秒")
-                time.sleep(float(delay_time) + 0.5)
-                log("🔄 重新发送请求...")
-                session.post(
-                    heartbeat_url,
-                    json={"heart_data": heart_data},
-                    timeout=20,
-                )
+            await asend_heartbeat(heart_data, session)
         except Exception:
             pass
 
-        time.sleep(1.5)
-        try:
-            response = session.get(progress_url)
-            rate = json.loads(response.text)["data"][video_id].get("rate", 0) or 0
+        await asyncio.sleep(1.5)
+        progress = await aget_video_progress(
+            course_id, user_id, classroom_id, video_id, session
+        )
+        if progress is not None:
+            rate = progress.get("rate", 0) or 0
             log(f"📊 {video_name} 进度: {float(rate) * 100:.1f}%")
-        except Exception:
-            pass
 
     log(f"✅ {video_name} 完成！")
 
 
-def process_single_homework(
-    hw: Homework,
-    course: Course,
-    course_info: ClassroomInfo,
-    session: requests.Session,
-):
-    """处理单个作业的答题"""
-    log(f"\n🎯 正在处理: {hw['name']}")
-
-    # 获取 leaf_type_id
-    leaf_type_id = get_leaf_type_id(course, hw["id"], session)
-    if not leaf_type_id:
-        log("  ❌ 无法获取作业详情ID (leaf_type_id)")
-        return
-
-    questions = get_homework_questions(leaf_type_id, course, session)
-
-    if not questions:
-        log("  ⚠️ 未获取到题目")
-        return
-
-    log(f"  📋 共 {len(questions)} 道题目")
-
-    def submit_one(i, q):
-        # 尝试从题目内容中获取 LibraryID 和 Version
-        library_id = None
-        version = None
-        if "content" in q:
-            library_id = q["content"].get("LibraryID") or q["content"].get("library_id")
-            version = q["content"].get("Version")
-
-        if not library_id or not version:
-            log(f"  ⚠️ 第{i}题 无法获取 LibraryID 或 Version，跳过")
-            return False, False
-
-        library_id = str(library_id)
-
-        # 查找答案
-        answer = db.get_answer(library_id, version)
-
-        if answer:
-            problem_id = q.get("problem_id") or q.get("id")
-            if problem_id is None:
-                log(f"  ⚠️ 第{i}题 无法获取题目ID，跳过")
-                return False, False
+class _HomeworkJob:
+    """答题流水线中一个作业的状态"""
+
+    def __init__(
+        self,
+        hw: Homework,
+        course: Course,
+        course_info: ClassroomInfo,
+        session: requests.Session,
+    ):
+        self.hw = hw
+        self.course = course
+        self.course_info = course_info
+        self.session = session
+        self.leaf_type_id: int | None = None
+        self.questions: list[Question] = []
+        self.pending = 0
+        self.success = 0
+        self.correct = 0
+
+    def finish_one(self, success: bool, correct: bool):
+        self.pending -= 1
+        self.success += success
+        self.correct += correct
+        if self.pending == 0:
+            self.report()
+
+    def report(self):
+        log(
+            f"  📊 {self.hw['name']} 提交 {self.success}/{len(self.questions)} 道，正确 {self.correct}/{self.success} 道"
+        )
 
-            if q.get("user", {}).get("my_count", 0) >= q.get("max_retry", 1):
-                log(f"  ⏭️ 第{i}题 达到最大回答次数，跳过")
-                return False, False
 
-            result = submit_homework_answer(
-                hw["chapter_id"], leaf_type_id, problem_id, answer, course_info, session
-            )
-            if result["success"]:
-                if result["is_correct"]:
-                    log(f"  ✅ 第{i}题 提交成功 - 回答正确")
-                    return True, True
-                else:
-                    correct_ans = ", ".join(result["correct_answer"])
-                    log(f"  ⚠️ 第{i}题 提交成功 - 回答错误，正确答案: {correct_ans}")
-                    return True, False
-            else:
-                log(f"  ❌ 第{i}题 提交失败")
-                return False, False
-        else:
-            log(f"  ⏭️ 第{i}题 无答案 (LibID: {library_id}, Ver: {version})，跳过")
-            return False, False
+async def _stage_fetch(job: _HomeworkJob) -> list[_HomeworkJob] | None:
+    """阶段一：解析 leaf_type_id 并拉取题目列表"""
+    log(f"\n🎯 正在处理: {job.hw['name']}")
 
-    success_count = 0
-    correct_count = 0
+    job.leaf_type_id = await aresolve_leaf_type_id(
+        job.course, job.hw["id"], job.session
+    )
+    if not job.leaf_type_id:
+        log(f"  ❌ {job.hw['name']} 无法获取作业详情ID (leaf_type_id)")
+        return None
 
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = [
-            executor.submit(submit_one, i, q) for i, q in enumerate(questions, 1)
-        ]
-        for future in futures:
-            s, c = future.result()
-            if s:
-                success_count += 1
-            if c:
-                correct_count += 1
-
-    log(
-        f"  📊 提交 {success_count}/{len(questions)} 道，正确 {correct_count}/{success_count} 道"
+    job.questions = await aget_homework_questions(
+        job.leaf_type_id, job.course, job.session
+    )
+    # 即将提交，之后再获取题目列表时需要最新的作答状态
+    forget_homework_questions(job.leaf_type_id, job.session)
+    if not job.questions:
+        log(f"  ⚠️ {job.hw['name']} 未获取到题目")
+        return None
+
+    log(f"  📋 {job.hw['name']} 共 {len(job.questions)} 道题目")
+    return [job]
+
+
+async def _stage_lookup(job: _HomeworkJob) -> list[tuple] | None:
+    """阶段二：整份作业一次批量查答案并规划，只把可提交的题目交给提交阶段"""
+    keys = [key for key in map(question_key, job.questions) if key]
+    answers = await run_io(db.get_answers_bulk, keys)
+    plan = plan_questions(job.questions, answers)
+
+    log(f"  🧭 {job.hw['name']} {format_counts(count_by_status(plan))}")
+
+    tasks = []
+    for item in plan:
+        if item["status"] == UNANSWERABLE:
+            log(f"  ⏭️ 第{item['index']}题 {item['reason']}，跳过")
+        elif item["status"] == ANSWERABLE:
+            tasks.append((job, item["index"], item["problem_id"], item["answer"]))
+
+    job.pending = len(tasks)
+    if not tasks:
+        job.report()
+    return tasks
+
+
+async def _stage_submit(task: tuple):
+    """阶段三：提交答案，所有作业的题目共用同一组提交协程"""
+    job, i, problem_id, answer = task
+    result = await asubmit_homework_answer(
+        job.hw["chapter_id"],
+        job.leaf_type_id,
+        problem_id,
+        answer,
+        job.course_info,
+        job.session,
     )
+    if result["success"]:
+        if result["is_correct"]:
+            log(f"  ✅ 第{i}题 提交成功 - 回答正确")
+            job.finish_one(True, True)
+        else:
+            correct_ans = ", ".join(result["correct_answer"])
+            log(f"  ⚠️ 第{i}题 提交成功 - 回答错误，正确答案: {correct_ans}")
+            job.finish_one(True, False)
+    else:
+        log(f"  ❌ 第{i}题 提交失败")
+        job.finish_one(False, False)
 
 
-def process_random_homework(
+async def aprocess_random_homework(
     hw: Homework,
     course: Course,
     course_info: ClassroomInfo,
@@ -214,12 +244,13 @@ def process_random_homework(
     log(f"\n🎲 正在随机答题: {hw['name']}")
 
     # 获取 leaf_type_id
-    leaf_type_id = get_leaf_type_id(course, hw["id"], session)
+    leaf_type_id = await aresolve_leaf_type_id(course, hw["id"], session)
     if not leaf_type_id:
         log("  ❌ 无法获取作业详情ID (leaf_type_id)")
         return
 
-    questions = get_homework_questions(leaf_type_id, course, session)
+    questions = await aget_homework_questions(leaf_type_id, course, session)
+    forget_homework_questions(leaf_type_id, session)
 
     if not questions:
         log("  ⚠️ 未获取到题目")
@@ -250,8 +281,10 @@ def process_random_homework(
         answer = [random.choice(options)]
 
         # 提交
-        result = submit_homework_answer(
-            hw["chapter_id"], leaf_type_id, problem_id, answer, course_info, session
+        result = await submit_scheduler.submit(
+            asubmit_homework_answer(
+                hw["chapter_id"], leaf_type_id, problem_id, answer, course_info, session
+            )
         )
         if result["success"]:
             status = "正确" if result["is_correct"] else "错误"
@@ -262,14 +295,27 @@ def process_random_homework(
         else:
             log(f"  ❌ 第{i}题 提交失败")
 
-        time.sleep(random.uniform(2, 3))
+        await asyncio.sleep(random.uniform(2, 3))
 
 
-def learn_videos(target_courses: list[Course], session: requests.Session):
-    for idx, course in enumerate(target_courses, 1):
-        log(f"\n🎯 [{idx}/{len(target_courses)}] 处理课程: {course['name']}")
-        videos, session = get_videos(course, session)
+async def _afetch_listings(
+    fetch, target_courses: list[Course], session: requests.Session
+) -> tuple[list[Course], list[tuple]]:
+    """并发拉取所有课程的列表，拉取失败的课程跳过，返回 (课程, 对应的列表结果)"""
+    listings = await scheduler.map(fetch(course, session) for course in target_courses)
+    ok = [i for i, listing in enumerate(listings) if listing is not None]
+    return [target_courses[i] for i in ok], [listings[i] for i in ok]
+
+
+async def alearn_videos(target_courses: list[Course], session: requests.Session):
+    # 先并发拉取所有课程的视频列表，再依次选择，最后统一调度
+    target_courses, listings = await _afetch_listings(
+        aget_videos, target_courses, session
+    )
 
+    jobs = []
+    for idx, (course, (videos, _)) in enumerate(zip(target_courses, listings), 1):
+        log(f"\n🎯 [{idx}/{len(target_courses)}] 处理课程: {course['name']}")
         video_list = list(videos.items())
         if not video_list:
             log("暂无视频")
@@ -290,159 +336,256 @@ def learn_videos(target_courses: list[Course], session: requests.Session):
         target_videos = (
             video_list if 0 in choices else [video_list[i - 1] for i in choices]
         )
+        jobs.extend(
+            awatch_video(
+                video_id, video_name, course["classroom_id"], course["sign"], session
+            )
+            for video_id, video_name in target_videos
+        )
 
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = []
-            for video_id, video_name in target_videos:
-                future = executor.submit(
-                    watch_video,
-                    video_id,
-                    video_name,
-                    course["classroom_id"],
-                    course["sign"],
-                    session,
-                )
-                futures.append(future)
+    await scheduler.map(jobs)
 
-            for future in futures:
-                future.result()
 
+def _choose_homeworks(homeworks: list[Homework]) -> list[Homework]:
+    """列出作业并让用户选择，返回选中的作业"""
+    for i, hw in enumerate(homeworks, 1):
+        deadline_str = "无截止时间"
+        if hw["score_deadline"]:
+            deadline_str = datetime.fromtimestamp(hw["score_deadline"] / 1000).strftime(
+                "%Y-%m-%d %H:%M"
+            )
+        log(f"  [{i}] {hw['name']}  截止: {deadline_str}")
 
-def fetch_homeworks(target_courses: list[Course], session: requests.Session):
-    """获取课程作业"""
-    for idx, course in enumerate(target_courses, 1):
-        log(f"\n📝 [{idx}/{len(target_courses)}] 获取课程作业: {course['name']}")
-        homeworks, session, course_info = get_homeworks(course, session)
+    hw_choice = get_input(
+        [],
+        "选择作业编号（0表示全部，多选空格分隔，q返回）: ",
+        lambda x: all(p.isdigit() and int(p) <= len(homeworks) for p in x.split()),
+    )
+    if not hw_choice:
+        return []
 
+    choices = [int(x) for x in hw_choice.split()]
+    return homeworks if 0 in choices else [homeworks[i - 1] for i in choices]
+
+
+async def _aplan_homeworks(
+    target_courses: list[Course], session: requests.Session, title: str, emoji: str
+) -> list[tuple]:
+    """并发拉取所有课程的作业列表，依次选择后预热 leaf_type_id
+
+    返回 [(course, 选中的作业, get_homeworks 的其余返回值), ...]
+    """
+    target_courses, listings = await _afetch_listings(
+        aget_homeworks, target_courses, session
+    )
+
+    plans = []
+    for idx, (course, (homeworks, *rest)) in enumerate(
+        zip(target_courses, listings), 1
+    ):
+        log(f"\n{emoji} [{idx}/{len(target_courses)}] {title}: {course['name']}")
         if not homeworks:
             log("暂无作业")
             continue
 
-        for i, hw in enumerate(homeworks, 1):
-            deadline_str = "无截止时间"
-            if hw["score_deadline"]:
-                deadline_str = datetime.fromtimestamp(
-                    hw["score_deadline"] / 1000
-                ).strftime("%Y-%m-%d %H:%M")
-            log(f"  [{i}] {hw['name']}  截止: {deadline_str}")
+        target_hws = _choose_homeworks(homeworks)
+        if target_hws:
+            plans.append((course, target_hws, rest))
 
-        hw_choice = get_input(
-            [],
-            "选择作业编号（0表示全部，多选空格分隔，q返回）: ",
-            lambda x: all(p.isdigit() and int(p) <= len(homeworks) for p in x.split()),
-        )
-        if not hw_choice:
-            continue
-
-        choices = [int(x) for x in hw_choice.split()]
-        target_hws = homeworks if 0 in choices else [homeworks[i - 1] for i in choices]
+    await scheduler.map(
+        awarm_leaf_type_ids(course, [hw["id"] for hw in target_hws], session)
+        for course, target_hws, _ in plans
+    )
+    return plans
 
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = []
-            for hw in target_hws:
-                future = executor.submit(
-                    process_single_homework, hw, course, course_info, session
-                )
-                futures.append(future)
 
-            for future in futures:
-                future.result()
+async def afetch_homeworks(target_courses: list[Course], session: requests.Session):
+    """获取课程作业"""
+    plans = await _aplan_homeworks(target_courses, session, "获取课程作业", "📝")
+    jobs = [
+        _HomeworkJob(hw, course, course_info, session)
+        for course, target_hws, (_, course_info) in plans
+        for hw in target_hws
+    ]
+    # 拉题、查答案、提交三个阶段各自并发、互相重叠，吞吐只受提交速率限制
+    await run_pipeline(
+        jobs,
+        [
+            (_stage_fetch, FETCH_CONCURRENCY),
+            (_stage_lookup, LOOKUP_CONCURRENCY),
+            (_stage_submit, SUBMIT_CONCURRENCY),
+        ],
+    )
+    report_cache(db.cache_stats())
 
 
-def random_answer(target_courses: list[Course], session: requests.Session):
+async def arandom_answer(target_courses: list[Course], session: requests.Session):
     """随机答题（用于获取答案）"""
-    for idx, course in enumerate(target_courses, 1):
-        log(f"\n🎲 [{idx}/{len(target_courses)}] 随机答题: {course['name']}")
-        homeworks, session, course_info = get_homeworks(course, session)
+    plans = await _aplan_homeworks(target_courses, session, "随机答题", "🎲")
+    await scheduler.map(
+        aprocess_random_homework(hw, course, course_info, session)
+        for course, target_hws, (_, course_info) in plans
+        for hw in target_hws
+    )
 
-        if not homeworks:
-            log("暂无作业")
-            continue
 
-        for i, hw in enumerate(homeworks, 1):
-            deadline_str = "无截止时间"
-            if hw["score_deadline"]:
-                deadline_str = datetime.fromtimestamp(
-                    hw["score_deadline"] / 1000
-                ).strftime("%Y-%m-%d %H:%M")
-            log(f"  [{i}] {hw['name']}  截止: {deadline_str}")
+async def aplan_courses(target_courses: list[Course], session: requests.Session):
+    """规划模式：统计题库覆盖率、预计请求数与耗时，不提交任何答案"""
+    target_courses, listings = await _afetch_listings(
+        aget_homeworks, target_courses, session
+    )
+    await scheduler.map(
+        awarm_leaf_type_ids(course, [hw["id"] for hw in homeworks], session)
+        for course, (homeworks, *_) in zip(target_courses, listings)
+    )
 
-        hw_choice = get_input(
-            [],
-            "选择作业编号（0表示全部，多选空格分隔，q返回）: ",
-            lambda x: all(p.isdigit() and int(p) <= len(homeworks) for p in x.split()),
-        )
-        if not hw_choice:
-            continue
+    async def fetch(course: Course, hw: Homework) -> list[Question]:
+        leaf_type_id = await aresolve_leaf_type_id(course, hw["id"], session)
+        if not leaf_type_id:
+            return []
+        return await aget_homework_questions(leaf_type_id, course, session)
 
-        choices = [int(x) for x in hw_choice.split()]
-        target_hws = homeworks if 0 in choices else [homeworks[i - 1] for i in choices]
+    question_lists = await scheduler.map(
+        (
+            fetch(course, hw)
+            for course, (homeworks, *_) in zip(target_courses, listings)
+            for hw in homeworks
+        ),
+        default=[],
+    )
 
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            futures = []
-            for hw in target_hws:
-                future = executor.submit(
-                    process_random_homework, hw, course, course_info, session
-                )
-                futures.append(future)
+    # 所有课程的题目一次批量查询题库
+    keys = bank_keys(question_lists)
+    answers = await run_io(db.get_answers_bulk, keys)
 
-            for future in futures:
-                future.result()
+    remaining = iter(question_lists)
+    courses = [
+        (course["name"], [(hw, next(remaining)) for hw in homeworks])
+        for course, (homeworks, *_) in zip(target_courses, listings)
+    ]
+    report_plan(courses, answers)
+    report_cache(db.cache_stats())
 
 
-def _fetch_single_homework_answers(
-    course: Course, hw: Homework, session: requests.Session
-) -> dict:
-    """获取单个作业的答案"""
-    leaf_type_id = get_leaf_type_id(course, hw["id"], session)
+async def _afetch_single_homework_answers(
+    course: Course,
+    hw: Homework,
+    mark: HarvestMark | None,
+    session: requests.Session,
+    writer: BatchWriter,
+) -> tuple[int, int, HarvestMark, list[tuple[str, str]]] | None:
+    """获取单个作业的答案，与上次收集相比有变化时才交给 writer 写入
+
+    返回 (课堂ID, 作业ID, 新的水位, 本次收集到的题目键)
+    """
+    leaf_type_id = await aresolve_leaf_type_id(course, hw["id"], session)
     if not leaf_type_id:
-        return {}
+        return None
+
+    questions = await aget_homework_questions(leaf_type_id, course, session)
+    # 收集完即丢弃缓存，整次收集的内存占用不随作业数量增长
+    forget_homework_questions(leaf_type_id, session)
+    records = collect_answers(questions)
+    digest = content_hash(records)
+    if mark is None or mark["content_hash"] != digest:
+        for record in records:
+            await writer.put(record)
+    keys = [(library_id, version) for library_id, version, _ in records]
+    return course["classroom_id"], hw["id"], make_mark(hw, questions, digest), keys
+
+
+async def asave_answers(target_courses: list[Course], session: requests.Session):
+    """生成并保存课程答案（增量：跳过上次收集后没有变化的作业）"""
+    for course in target_courses:
+        log(f"🔍 正在扫描课程答案: {course['name']}")
+    target_courses, listings = await _afetch_listings(
+        aget_homeworks, target_courses, session
+    )
+    marks = await scheduler.map(
+        (
+            run_io(
+                db.get_harvest_marks,
+                "xtzx",
+                course["classroom_id"],
+                [hw["id"] for hw in homeworks],
+            )
+            for course, (homeworks, *_) in zip(target_courses, listings)
+        ),
+        default={},
+    )
+    stale = [
+        [hw for hw in homeworks if not is_fresh(hw, course_marks.get(hw["id"]))]
+        for (homeworks, *_), course_marks in zip(listings, marks)
+    ]
+    skipped = sum(len(homeworks) for homeworks, *_ in listings) - sum(map(len, stale))
+    if skipped:
+        log(f"⏭️ {skipped} 个作业自上次收集后不会再有新答案，已跳过")
+    await scheduler.map(
+        awarm_leaf_type_ids(course, [hw["id"] for hw in homeworks], session)
+        for course, homeworks in zip(target_courses, stale)
+        if homeworks
+    )
 
-    questions = get_homework_questions(leaf_type_id, course, session)
-    hw_answers = {}
-    for q in questions:
-        # 提取 LibraryID
-        library_id = None
-        if "content" in q:
-            library_id = q["content"].get("LibraryID") or q["content"].get("library_id")
+    # 所有课程的作业放进同一个调度器，不再逐门课程等待
+    # 作业按完成顺序把答案推入有界队列，专用写线程边收边按批写入
+    async with BatchWriter(db.save_answers_bulk) as writer:
+        new_marks = await scheduler.map(
+            _afetch_single_homework_answers(
+                course, hw, course_marks.get(hw["id"]), session, writer
+            )
+            for course, homeworks, course_marks in zip(target_courses, stale, marks)
+            for hw in homeworks
+        )
+    harvested = [result for result in new_marks if result]
+    failed = {(library_id, version) for library_id, version, _ in writer.failed}
+    # 答案落库后再记录水位；有答案写入失败的作业不记录，下次重新收集
+    await run_io(
+        db.save_harvest_marks,
+        "xtzx",
+        [
+            (classroom_id, hw_id, mark)
+            for classroom_id, hw_id, mark, keys in harvested
+            if failed.isdisjoint(keys)
+        ],
+    )
+    report_cache(db.cache_stats())
+    if failed:
+        log(f"⚠️ {len(writer.failed)} 个答案写入失败，相关作业下次收集时重试")
 
-        version = q["content"].get("Version")
+    found = sum(len(keys) for *_, keys in harvested)
+    if found == 0 and not skipped:
+        log("⚠️ 未找到任何答案")
+        return
 
-        if not library_id or not version:
-            continue
+    if writer.written == 0 and not failed:
+        log("✅ 题库已是最新，没有答案发生变化")
+        return
 
-        ans = None
-        if "user" in q and q["user"].get("answer"):
-            ans = q["user"]["answer"]
+    log(f"✅ 扫描 {found} 个答案，其中 {writer.written} 个有变化已保存到数据库")
 
-        if library_id and ans:
-            if str(library_id) not in hw_answers:
-                hw_answers[str(library_id)] = {}
-            hw_answers[str(library_id)][version] = ans
 
-    return hw_answers
+# ---- 同步入口：在事件循环中运行对应的协程 ----
 
 
-def save_answers(course: Course, session: requests.Session):
-    """生成并保存课程答案"""
-    log(f"🔍 正在扫描课程答案: {course['name']}")
-    homeworks, _, _ = get_homeworks(course, session)
+def learn_videos(target_courses: list[Course], session: requests.Session):
+    run(alearn_videos(target_courses, session))
+
+
+def fetch_homeworks(target_courses: list[Course], session: requests.Session):
+    """获取课程作业"""
+    run(afetch_homeworks(target_courses, session))
 
-    count = 0
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = [
-            executor.submit(_fetch_single_homework_answers, course, hw, session)
-            for hw in homeworks
-        ]
-        for future in futures:
-            hw_answers = future.result()
-            for lib_id, versions in hw_answers.items():
-                for version, answer in versions.items():
-                    db.save_answer(lib_id, version, answer)
-                    count += 1
-
-    if count == 0:
-        log("⚠️ 未找到任何答案")
-        return
 
-    log(f"✅ 已保存 {count} 个答案到数据库")
+def random_answer(target_courses: list[Course], session: requests.Session):
+    """随机答题（用于获取答案）"""
+    run(arandom_answer(target_courses, session))
+
+
+def plan_courses(target_courses: list[Course], session: requests.Session):
+    """规划模式：统计题库覆盖率、预计请求数与耗时，不提交任何答案"""
+    run(aplan_courses(target_courses, session))
+
+
+def save_answers(target_courses: list[Course], session: requests.Session):
+    """生成并保存课程答案"""
+    run(asave_answers(target_courses, session))
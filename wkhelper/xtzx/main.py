@@ -1,13 +1,17 @@
 from ..utils import get_input, log
-from .api import get_basic_info, get_courses
+from .api import get_courses
 from .auth import init_session
-from .logic import fetch_homeworks, learn_videos, random_answer, save_answers
+from .logic import (
+    fetch_homeworks,
+    learn_videos,
+    plan_courses,
+    random_answer,
+    save_answers,
+)
 
 
 def main():
-    session = init_session()
-
-    userinfo = get_basic_info(session)
+    session, userinfo = init_session()
     log(f"👤 登录成功：{userinfo['name']}（{userinfo['school']}）")
 
     log("📚 正在获取课程列表...")
@@ -28,6 +32,7 @@ def main():
                 "  [1] 学习课程视频",
                 "  [2] 完成课程作业",
                 "  [3] 下载课程答案",
+                "  [4] 规划答题（仅统计，不提交）",
                 "  [q] 退出",
             ],
             "输入功能编号: ",
@@ -36,6 +41,7 @@ def main():
                 "1",
                 "2",
                 "3",
+                "4",
             ),
         )
         if not mode:
@@ -56,7 +62,8 @@ def main():
         elif mode == "2":
             fetch_homeworks(target_courses, session)
         elif mode == "3":
-            for course in target_courses:
-                save_answers(course, session)
+            save_answers(target_courses, session)
+        elif mode == "4":
+            plan_courses(target_courses, session)
 
     log("👋 再见！")
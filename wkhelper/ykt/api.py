@@ -1,35 +1,33 @@
-import json
+import asyncio
 import random
-import re
-import time
 
 import requests
 
+from ..aio import run_io
+from ..codec import submit_answer
+from ..course_index import (
+    LEAF_HOMEWORK,
+    LEAF_TEXT,
+    LEAF_VIDEO,
+    CourseIndex,
+    load_course_index,
+)
+from ..db import db
+from ..governor import MAX_THROTTLE_RETRIES, governor, parse_throttle
+from ..transport import decode_json, http_get
 from ..utils import log
+from .context import CourseContext, get_course_context
 from .models import ClassroomInfo, Course, Homework, Question, SubmitResult, UserInfo
 
-
-def _get_course_kwargs(course: Course) -> dict:
-    """生成课程相关的请求参数 (headers 和 cookies)"""
-    cookies = {
-        "xtbz": "ykt",
-        "platform_type": "1",
-        "uv_id": str(course["university_id"]),
-        "university_id": str(course["university_id"]),
-        "platform_id": "3",
-        "classroom_id": str(course["classroom_id"]),
-        "classroomID": str(course["classroom_id"]),
-    }
-    headers = {
-        "classroom-id": str(course["classroom_id"]),
-        "Xtbz": "ykt",
-    }
-    return {"headers": headers, "cookies": cookies}
+# 题目列表的复用时间（秒）：规划之后紧接着答题或收集答案时不再重复下载。
+# 答题、收集答案取到题目后立即由 forget_homework_questions 丢弃，
+# 只有规划模式取到的题目列表会保留到过期
+QUESTIONS_TTL = 300.0
 
 
 def get_basic_info(session: requests.Session) -> UserInfo:
-    response = session.get("https://www.yuketang.cn/api/v3/user/basic-info")
-    resp = json.loads(response.text)
+    response = http_get(session, "https://www.yuketang.cn/api/v3/user/basic-info")
+    resp = decode_json(response)
     if resp["code"] != 0:
         log("❌ 获取用户信息失败！")
         exit(1)
@@ -39,8 +37,8 @@ def get_basic_info(session: requests.Session) -> UserInfo:
 
 def get_courses(session: requests.Session) -> list[Course]:
     url = "https://www.yuketang.cn/v2/api/web/courses/list?identity=2"
-    response = session.get(url)
-    resp = json.loads(response.text)
+    response = http_get(session, url)
+    resp = decode_json(response)
     if resp["errcode"] != 0:
         log("❌ 获取课程列表失败！")
         exit(1)
@@ -60,107 +58,92 @@ def get_courses(session: requests.Session) -> list[Course]:
         exit(1)
 
 
-def get_classroom_info(
-    course: Course, session: requests.Session
-) -> tuple[ClassroomInfo, dict]:
-    url = (
-        f"https://www.yuketang.cn/v2/api/web/classrooms/{course['classroom_id']}?role=5"
-    )
-    kwargs = _get_course_kwargs(course)
-    response = session.get(url, **kwargs)
-    data = json.loads(response.text)
+def get_classroom_info(ctx: CourseContext) -> ClassroomInfo:
+    url = f"https://www.yuketang.cn/v2/api/web/classrooms/{ctx.classroom_id}?role=5"
+    data = ctx.get_json(url)
     if data["errcode"] != 0:
         log("❌ 获取课程信息失败！")
         exit(1)
-    return data["data"], kwargs
+    return data["data"]
 
 
-def get_chapter_info(
-    course: Course, session: requests.Session
-) -> tuple[list[dict], dict, ClassroomInfo]:
+def get_chapter_info(ctx: CourseContext) -> tuple[list[dict], ClassroomInfo]:
     """获取课程章节信息"""
-    course_info, kwargs = get_classroom_info(course, session)
+    course = ctx.course
+    course_info = get_classroom_info(ctx)
     url = f"https://www.yuketang.cn/mooc-api/v1/lms/learn/course/chapter?cid={course['classroom_id']}&sign={course_info['course_sign']}&term=latest&uv_id={course['university_id']}&classroom_id={course['classroom_id']}"
     try:
-        response = session.get(url, **kwargs)
-        data = json.loads(response.text)["data"]["course_chapter"]
-        return data, kwargs, course_info
+        data = decode_json(ctx.get(url))["data"]["course_chapter"]
+        return data, course_info
     except Exception as e:
         log(f"❌ 获取章节信息失败！错误: {e}")
         exit(1)
 
 
-def _iter_leaves(chapter_data: list[dict]):
-    for chapter in chapter_data:
-        if "section_leaf_list" in chapter:
-            for section in chapter["section_leaf_list"]:
-                yield from section.get("leaf_list", [section])
+def get_course_index(ctx: CourseContext) -> CourseIndex:
+    """获取课程索引（章节树只拉取一次，按 TTL 缓存）"""
+
+    def load() -> tuple[list[dict], dict]:
+        chapter_data, course_info = get_chapter_info(ctx)
+        return chapter_data, dict(course_info)
+
+    return load_course_index("ykt", ctx.classroom_id, load)
 
 
 def get_videos(
     course: Course, session: requests.Session
-) -> tuple[dict[int, str], dict, ClassroomInfo]:
+) -> tuple[dict[int, str], CourseContext, ClassroomInfo]:
     """获取课程视频（leaf_type == 0）"""
-    chapter_data, kwargs, course_info = get_chapter_info(course, session)
+    ctx = get_course_context(course, session)
+    index = get_course_index(ctx)
 
-    videos = {
-        leaf["id"]: leaf["name"]
-        for leaf in _iter_leaves(chapter_data)
-        if leaf.get("leaf_type") == 0
-    }
+    videos = {leaf["id"]: leaf["name"] for leaf in index.leaves(LEAF_VIDEO)}
 
     log(f"📋 找到 {len(videos)} 个视频")
-    return videos, kwargs, course_info
+    return videos, ctx, index.classroom_info
 
 
 def get_texts(
     course: Course, session: requests.Session
-) -> tuple[dict[int, str], dict, ClassroomInfo]:
+) -> tuple[dict[int, str], CourseContext, ClassroomInfo]:
     """获取课程图文（leaf_type == 3）"""
-    chapter_data, kwargs, course_info = get_chapter_info(course, session)
+    ctx = get_course_context(course, session)
+    index = get_course_index(ctx)
 
-    texts = {
-        leaf["id"]: leaf["name"]
-        for leaf in _iter_leaves(chapter_data)
-        if leaf.get("leaf_type") == 3
-    }
+    texts = {leaf["id"]: leaf["name"] for leaf in index.leaves(LEAF_TEXT)}
 
     log(f"📋 找到 {len(texts)} 个图文")
-    return texts, kwargs, course_info
+    return texts, ctx, index.classroom_info
 
 
 def get_homeworks(
     course: Course, session: requests.Session
-) -> tuple[list[Homework], dict, ClassroomInfo]:
+) -> tuple[list[Homework], CourseContext, ClassroomInfo]:
     """获取课程中的课堂作业（leaf_type == 6）"""
-    chapter_data, kwargs, course_info = get_chapter_info(course, session)
+    ctx = get_course_context(course, session)
+    index = get_course_index(ctx)
 
     homeworks: list[Homework] = [
         {
             "id": leaf["id"],
             "name": leaf["name"],
-            "start_time": leaf.get("start_time"),
-            "score_deadline": leaf.get("score_deadline"),
-            "is_score": leaf.get("is_score"),
-            "chapter_id": leaf.get("chapter_id"),
+            "start_time": leaf["start_time"],
+            "score_deadline": leaf["score_deadline"],
+            "is_score": leaf["is_score"],
+            "chapter_id": leaf["chapter_id"],
         }
-        for leaf in _iter_leaves(chapter_data)
-        if leaf.get("leaf_type") == 6
+        for leaf in index.leaves(LEAF_HOMEWORK)
     ]
 
     log(f"📋 找到 {len(homeworks)} 个课堂作业")
-    return homeworks, kwargs, course_info
+    return homeworks, ctx, index.classroom_info
 
 
-def get_leaf_info(
-    course: Course, leaf_id: int, session: requests.Session
-) -> int | None:
+def get_leaf_info(ctx: CourseContext, leaf_id: int) -> int | None:
     """获取 leaf 信息，提取 leaf_type_id"""
-    kwargs = _get_course_kwargs(course)
-    url = f"https://www.yuketang.cn/mooc-api/v1/lms/learn/leaf_info/{course['classroom_id']}/{leaf_id}/"
+    url = f"https://www.yuketang.cn/mooc-api/v1/lms/learn/leaf_info/{ctx.classroom_id}/{leaf_id}/"
     try:
-        response = session.get(url, **kwargs)
-        data = json.loads(response.text)
+        data = ctx.get_json(url)
         if data.get("success") or data.get("data"):
             return data.get("data", {}).get("content_info", {}).get("leaf_type_id")
         return None
@@ -169,83 +152,201 @@ def get_leaf_info(
         return None
 
 
-def get_homework_questions(
-    homework_id: int, course: Course, session: requests.Session
-) -> list[Question]:
-    """获取作业题目列表"""
-    kwargs = _get_course_kwargs(course)
-    url = f"https://www.yuketang.cn/mooc-api/v1/lms/exercise/get_exercise_list/{homework_id}/"
+def _questions_url(homework_id: int) -> str:
+    return f"https://www.yuketang.cn/mooc-api/v1/lms/exercise/get_exercise_list/{homework_id}/"
+
+
+def get_homework_questions(homework_id: int, ctx: CourseContext) -> list[Question]:
+    """获取作业题目列表，QUESTIONS_TTL 内重复获取直接复用，返回值只读"""
+    url = _questions_url(homework_id)
     try:
-        response = session.get(url, **kwargs)
-        data = json.loads(response.text)
+        data = ctx.get_json(url, ttl=QUESTIONS_TTL)
         if data.get("success", False):
             return data.get("data", {}).get("problems", [])
+        ctx.forget_json(url)
         return []
     except Exception as e:
         log(f"❌ 获取作业题目失败！错误: {e}")
         return []
 
 
-def check_text_finish_status(
-    text_id: int, course: Course, session: requests.Session
-) -> dict:
+def forget_homework_questions(homework_id: int, ctx: CourseContext):
+    """丢弃复用中的题目列表，开始提交前调用，之后的获取拿到最新的作答状态"""
+    ctx.forget_json(_questions_url(homework_id))
+
+
+def check_text_finish_status(text_id: int, ctx: CourseContext) -> dict:
     """检查图文阅读状态"""
-    kwargs = _get_course_kwargs(course)
     url = f"https://www.yuketang.cn/mooc-api/v1/lms/learn/user_article_finish_status/{text_id}/"
     try:
-        response = session.get(url, **kwargs)
-        return json.loads(response.text)
+        return decode_json(ctx.get(url))
     except Exception as e:
         log(f"❌ 获取图文阅读状态失败！错误: {e}")
         return {}
 
 
-def submit_homework_answer(
-    problem_id: int,
-    answer: str | list,
-    course_info: ClassroomInfo,
-    session: requests.Session,
-    kwargs: dict,
-) -> SubmitResult:
-    """提交单个题目答案，返回提交结果详情"""
+def _post_answer(
+    payload: dict, ctx: CourseContext
+) -> tuple[float | None, SubmitResult]:
+    """发送一次答案提交请求，返回 (限流等待秒数, 提交结果)"""
     url = "https://www.yuketang.cn/mooc-api/v1/lms/exercise/problem_apply/"
+    response = ctx.post(url, json=payload)
+
+    delay = parse_throttle(response.content)
+    if delay is not None:
+        return delay, {"success": False, "is_correct": False, "correct_answer": []}
+
+    data = decode_json(response)
+    if data.get("success") is True:
+        result_data = data.get("data", {})
+        return None, {
+            "success": True,
+            "is_correct": result_data.get(
+                "is_right", result_data.get("is_correct", False)
+            ),
+            "correct_answer": result_data.get("answer", []),
+        }
+    return None, {"success": False, "is_correct": False, "correct_answer": []}
 
-    # 确保 answer 是列表格式
-    if isinstance(answer, str):
-        answer = [answer]
 
-    payload = {
+def _answer_payload(
+    problem_id: int, answer: str | list, course_info: ClassroomInfo
+) -> dict:
+    return {
         "classroom_id": course_info["id"],
         "problem_id": problem_id,
-        "answer": answer,
+        "answer": submit_answer(answer, split_choices=True),
     }
 
+
+def get_video_progress(
+    classroom_info: ClassroomInfo,
+    user_id: int,
+    video_id: int,
+    ctx: CourseContext,
+) -> dict | None:
+    """获取视频观看进度，失败时返回 None"""
+    url = f"https://www.yuketang.cn/video-log/get_video_watch_progress/?cid={classroom_info['course_id']}&user_id={user_id}&classroom_id={classroom_info['id']}&video_type=video&vtype=rate&video_id={video_id}&snapshot=1"
+    try:
+        return decode_json(ctx.get(url))["data"][str(video_id)]
+    except Exception:
+        return None
+
+
+def send_heartbeat(heart_data: list[dict], ctx: CourseContext) -> float | None:
+    """发送视频心跳，被限流时返回需要等待的秒数"""
+    url = "https://www.yuketang.cn/video-log/heartbeat/"
+    response = ctx.post(url, json={"heart_data": heart_data})
+    return parse_throttle(response.content)
+
+
+# ---- 异步接口：阻塞请求在 IO 线程池执行，等待由协程承担 ----
+
+
+async def aget_videos(
+    course: Course, session: requests.Session
+) -> tuple[dict[int, str], CourseContext, ClassroomInfo]:
+    return await run_io(get_videos, course, session)
+
+
+async def aget_texts(
+    course: Course, session: requests.Session
+) -> tuple[dict[int, str], CourseContext, ClassroomInfo]:
+    return await run_io(get_texts, course, session)
+
+
+async def aget_homeworks(
+    course: Course, session: requests.Session
+) -> tuple[list[Homework], CourseContext, ClassroomInfo]:
+    return await run_io(get_homeworks, course, session)
+
+
+async def aget_chapter_info(ctx: CourseContext) -> tuple[list[dict], ClassroomInfo]:
+    return await run_io(get_chapter_info, ctx)
+
+
+async def aget_leaf_info(ctx: CourseContext, leaf_id: int) -> int | None:
+    return await run_io(get_leaf_info, ctx, leaf_id)
+
+
+async def awarm_leaf_type_ids(
+    ctx: CourseContext, leaf_ids: list[int]
+) -> dict[int, int]:
+    """批量解析 leaf_type_id：先查本地缓存，缺失的在共享 IO 线程池中并发请求后一次性写回"""
+    resolved = await run_io(db.get_leaf_type_ids, "ykt", ctx.classroom_id, leaf_ids)
+    missing = [leaf_id for leaf_id in leaf_ids if leaf_id not in resolved]
+    if not missing:
+        return resolved
+
+    results = await asyncio.gather(
+        *(run_io(get_leaf_info, ctx, leaf_id) for leaf_id in missing)
+    )
+    fetched = {
+        leaf_id: leaf_type_id
+        for leaf_id, leaf_type_id in zip(missing, results)
+        if leaf_type_id
+    }
+    await run_io(db.save_leaf_type_ids, "ykt", ctx.classroom_id, fetched)
+    resolved.update(fetched)
+    return resolved
+
+
+async def aresolve_leaf_type_id(ctx: CourseContext, leaf_id: int) -> int | None:
+    return (await awarm_leaf_type_ids(ctx, [leaf_id])).get(leaf_id)
+
+
+async def aget_homework_questions(
+    homework_id: int, ctx: CourseContext
+) -> list[Question]:
+    return await run_io(get_homework_questions, homework_id, ctx)
+
+
+async def acheck_text_finish_status(text_id: int, ctx: CourseContext) -> dict:
+    return await run_io(check_text_finish_status, text_id, ctx)
+
+
+async def aget_video_progress(
+    classroom_info: ClassroomInfo,
+    user_id: int,
+    video_id: int,
+    ctx: CourseContext,
+) -> dict | None:
+    return await run_io(get_video_progress, classroom_info, user_id, video_id, ctx)
+
+
+async def asend_heartbeat(heart_data: list[dict], ctx: CourseContext) -> bool:
+    """发送视频心跳，被限流时等待 governor 放行后重试，返回是否发送成功"""
+    for _ in range(MAX_THROTTLE_RETRIES):
+        await governor.aacquire("heartbeat")
+        delay = await run_io(send_heartbeat, heart_data, ctx)
+        if delay is None:
+            governor.report_success("heartbeat")
+            return True
+        governor.report_throttle("heartbeat", delay)
+    return False
+
+
+async def asubmit_homework_answer(
+    problem_id: int,
+    answer: str | list,
+    course_info: ClassroomInfo,
+    ctx: CourseContext,
+) -> SubmitResult:
+    """提交单个题目答案（异步），限流等待与提交间隔不占用线程"""
+    payload = _answer_payload(problem_id, answer, course_info)
+
     try:
-        response = session.post(url, json=payload, **kwargs)
-
-        # 处理限流
-        match = re.search(r"Expected available in(.+?)second.", response.text)
-        if match:
-            delay_time = match.group(1).strip()
-            log(f"⚠️  服务器限流，需等待 {delay_time} 秒")
-            time.sleep(float(delay_time) + 0.5)
-            log("🔄 重新发送请求...")
-            return submit_homework_answer(
-                problem_id, answer, course_info, session, kwargs
-            )
-
-        data = json.loads(response.text)
-        if data.get("success") is True:
-            result_data = data.get("data", {})
-            # 添加3-4秒随机延迟，模拟人工操作
-            time.sleep(random.uniform(3, 4))
-            return {
-                "success": True,
-                "is_correct": result_data.get(
-                    "is_right", result_data.get("is_correct", False)
-                ),
-                "correct_answer": result_data.get("answer", []),
-            }
+        for _ in range(MAX_THROTTLE_RETRIES):
+            await governor.aacquire("submit")
+            delay, result = await run_io(_post_answer, payload, ctx)
+            if delay is None:
+                governor.report_success("submit")
+                if result["success"]:
+                    # 添加3-4秒随机延迟，模拟人工操作
+                    await asyncio.sleep(random.uniform(3, 4))
+                return result
+            governor.report_throttle("submit", delay)
+        log("❌ 提交答案失败！多次被服务器限流")
         return {"success": False, "is_correct": False, "correct_answer": []}
     except Exception as e:
         log(f"❌ 提交答案失败！错误: {e}")
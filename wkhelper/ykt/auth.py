@@ -1,14 +1,20 @@
 import json
 
-import qrcode
 import requests
-import websocket
 
+from ..session_store import clear_session, load_session, save_session
+from ..transport import AUTH_STATUS, build_session, decode_json, http_get, http_post
 from ..utils import log
+from .api import get_basic_info
+from .models import UserInfo
 
 
 def get_cookie() -> dict:
     """雨课堂扫码登录获取Cookie"""
+    # 仅在需要扫码时导入二维码与 websocket 依赖
+    import qrcode
+    import websocket
+
     login_data = {}
 
     def on_message(ws, message):
@@ -42,10 +48,12 @@ def get_cookie() -> dict:
         log("❌ 登录失败，未获取到登录信息")
         exit(1)
 
-    response = requests.post(
-        "https://www.yuketang.cn/pc/web_login",
-        json={"Auth": login_data["Auth"], "UserID": str(login_data["UserID"])},
-    )
+    with requests.Session() as session:
+        response = http_post(
+            session,
+            "https://www.yuketang.cn/pc/web_login",
+            json={"Auth": login_data["Auth"], "UserID": str(login_data["UserID"])},
+        )
 
     return {
         "csrftoken": response.cookies.get("csrftoken"),
@@ -53,7 +61,46 @@ def get_cookie() -> dict:
     }
 
 
-def init_session() -> requests.Session:
+def _build_session(cookies: dict) -> requests.Session:
+    return build_session(
+        {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            "Content-Type": "application/json",
+            "Referer": "https://www.yuketang.cn/",
+            "X-CSRFToken": cookies["csrftoken"],
+            "Xtbz": "ykt",
+        },
+        cookies,
+    )
+
+
+def _load_user_info(session: requests.Session) -> UserInfo | None:
+    """用 basic-info 接口校验登录状态，有效时返回用户信息，服务端拒绝时返回 None
+
+    网络错误由 http_get 重试，仍然失败时直接抛出，不会误删本地登录状态
+    """
+    response = http_get(session, "https://www.yuketang.cn/api/v3/user/basic-info")
+    if response.status_code in AUTH_STATUS:
+        return None
+    response.raise_for_status()
+    resp = decode_json(response)
+    if resp.get("code") != 0:
+        return None
+    return resp["data"]
+
+
+def init_session() -> tuple[requests.Session, UserInfo]:
+    """返回 (会话, 当前用户信息)"""
+    cookies = load_session("ykt")
+    if cookies:
+        session = _build_session(cookies)
+        userinfo = _load_user_info(session)
+        if userinfo is not None:
+            log("✅ 已复用本地登录状态")
+            return session, userinfo
+        log("⚠️ 本地登录状态已失效，重新扫码登录")
+        clear_session("ykt")
+
     log("🔐 正在获取雨课堂Cookie...")
     cookies = get_cookie()
 
@@ -62,14 +109,7 @@ def init_session() -> requests.Session:
         exit(1)
 
     log("✅ Cookie获取成功！")
+    save_session("ykt", cookies)
 
-    session = requests.Session()
-    session.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-        "Content-Type": "application/json",
-        "Referer": "https://www.yuketang.cn/",
-        "X-CSRFToken": cookies["csrftoken"],
-        "Xtbz": "ykt",
-    })
-    session.cookies.update(cookies)
-    return session
+    session = _build_session(cookies)
+    return session, get_basic_info(session)
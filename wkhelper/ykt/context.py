@@ -0,0 +1,73 @@
+import threading
+from typing import Any
+
+import requests
+
+from ..transport import build_session, forget_json, get_json, http_get, http_post
+from .models import Course
+
+
+class CourseContext:
+    """单门课程的请求上下文
+
+    课程相关的 headers / cookies 只在创建时构建一次；每个工作线程第一次使用时
+    从登录会话复制出一个独立的 Session，并预先绑定课程 cookies，之后每次请求
+    都不再合并 cookies，也不会有多个线程同时修改同一个会话的 cookie jar。
+    """
+
+    def __init__(self, course: Course, session: requests.Session):
+        self.course = course
+        self.classroom_id = course["classroom_id"]
+        classroom_id = str(course["classroom_id"])
+        university_id = str(course["university_id"])
+        self.headers = {
+            **session.headers,
+            "classroom-id": classroom_id,
+            "Xtbz": "ykt",
+        }
+        self.cookies = {
+            **session.cookies.get_dict(),
+            "xtbz": "ykt",
+            "platform_type": "1",
+            "uv_id": university_id,
+            "university_id": university_id,
+            "platform_id": "3",
+            "classroom_id": classroom_id,
+            "classroomID": classroom_id,
+        }
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        """当前线程专属的会话"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = build_session(self.headers, self.cookies)
+            self._local.session = session
+        return session
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return http_get(self.session, url, **kwargs)
+
+    def get_json(self, url: str, **kwargs) -> Any:
+        # 同一课程各线程的会话代表同一身份，跨线程合并相同请求
+        return get_json(self.session, url, scope=self, **kwargs)
+
+    def forget_json(self, url: str, **kwargs):
+        forget_json(self.session, url, scope=self, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return http_post(self.session, url, **kwargs)
+
+
+_contexts: dict[int, CourseContext] = {}
+_lock = threading.Lock()
+
+
+def get_course_context(course: Course, session: requests.Session) -> CourseContext:
+    """获取课程上下文，同一课堂在整个进程内复用"""
+    with _lock:
+        ctx = _contexts.get(course["classroom_id"])
+        if ctx is None:
+            ctx = _contexts[course["classroom_id"]] = CourseContext(course, session)
+        return ctx